@@ -1,24 +1,35 @@
 # ruff: noqa: E501
 
-import asyncio
-import random
+import sys
 import time
 import typing
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
 from datetime import datetime
 from pathlib import Path
 
 import chromadb
-import httpx
 import polars as pl
-import pydantic
 import pytz
 import streamlit as st
-import toml
 from auth0.authentication import GetToken
 from auth0.management import Auth0
-from google import genai
-from google.genai import types
-from lxml import html
+from chromadb.api.client import SharedSystemClient
+
+sys.path.append(str(object=Path(__file__).resolve().parents[1] / "scrape"))
+
+import answer
+import embedding
+import facet
+import flight
+import jobs
+import keypool
+import lexical
+import store
+
+CANDIDATES = 20
+
+DIRECT_ANSWER_DISTANCE = answer.DIRECT_ANSWER_DISTANCE
 
 
 def get_timestamp() -> str:
@@ -30,16 +41,7 @@ def get_timestamp() -> str:
 def profile_card():
     with st.expander(label="Profil", expanded=True):
         if (user := st.user)["is_logged_in"]:
-            auth0 = Auth0(
-                domain=(domain := st.secrets["auth"]["auth0"]["domain"]),
-                token=GetToken(
-                    domain=domain,
-                    client_id=st.secrets["auth"]["auth0"]["client_id"],
-                    client_secret=st.secrets["auth"]["auth0"]["client_secret"],
-                ).client_credentials(audience=f"https://{domain}/api/v2/")[
-                    "access_token"
-                ],
-            )
+            auth0: Auth0 = get_auth0()
 
             role_badge = next(
                 (
@@ -69,19 +71,261 @@ def profile_card():
                 st.login(provider="auth0")
 
 
-def get_augmented_prompt(
+def get_augmented_prompt(prompt: str, documents: list, metadatas: list) -> str:
+    return (
+        """
+Konteks yang Tersedia:
+{}
+
+Pertanyaan Pengguna:
+{}
+""".replace("  ", "")
+        .strip()
+        .format(
+            "\n".join(
+                [
+                    "- {} {} [Sumber: {} Nomor: {}] ".format(
+                        question,
+                        meta_data["answer"],
+                        meta_data["jenis_peraturan"],
+                        meta_data["nomor_peraturan"],
+                    )
+                    for question, meta_data in zip(documents, metadatas, strict=True)
+                ],
+            ),
+            prompt,
+        )
+    )
+
+
+def retrieve(collection: chromadb.Collection, prompt: str) -> dict:
+    start: float = time.perf_counter()
+    timings: dict[str, float] = {}
+    n_results: int = st.session_state["n_results"]
+    include: list[str] = st.session_state["include"]
+    index: lexical.LexicalIndex | None = get_lexical_index()
+    distances: dict[str, float] = {}
+    query_embeddings: list | None = None
+
+    step: float = time.perf_counter()
+    permalink: str | None = (
+        index.cite(query=prompt, include=include) if index is not None else None
+    )
+    timings["citation"] = time.perf_counter() - step
+
+    if index is not None and permalink is not None:
+        step: float = time.perf_counter()
+        ids: list[str] = index.search(
+            query=prompt,
+            n=n_results,
+            include=include,
+            permalink=permalink,
+        )
+        timings["lexical"] = time.perf_counter() - step
+        sources: dict[str, str] = dict.fromkeys(ids, "citation")
+    else:
+        step: float = time.perf_counter()
+        lexical_ids: list[str] = (
+            index.search(query=prompt, n=CANDIDATES, include=include)
+            if index is not None
+            else []
+        )
+        timings["lexical"] = time.perf_counter() - step
+
+        step: float = time.perf_counter()
+        query_embeddings: list = embed_query(collection=collection, text=prompt)
+        query_result: chromadb.QueryResult = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=max(n_results, CANDIDATES),
+            where={"status_dokumen": {"$in": include}},
+            include=["distances"],
+        )
+        timings["vector"] = time.perf_counter() - step
+
+        distances: dict[str, float] = dict(
+            zip(query_result["ids"][0], query_result["distances"][0], strict=True),
+        )
+        ids: list[str] = lexical.rrf(
+            rankings=[query_result["ids"][0], lexical_ids],
+        )[:n_results]
+        sources: dict[str, str] = {
+            id_: (
+                ("both" if id_ in lexical_ids else "vector")
+                if id_ in distances
+                else "lexical"
+            )
+            for id_ in ids
+        }
+
+    step: float = time.perf_counter()
+    get_result: chromadb.GetResult = (
+        collection.get(ids=ids, include=["documents", "metadatas"])
+        if ids
+        else {"ids": [], "documents": [], "metadatas": []}
+    )
+    records: dict[str, tuple[str, dict]] = dict(
+        zip(
+            get_result["ids"],
+            zip(get_result["documents"], get_result["metadatas"], strict=True),
+            strict=True,
+        ),
+    )
+    ids: list[str] = [id_ for id_ in ids if id_ in records]
+    documents: list[str] = [records[id_][0] for id_ in ids]
+    metadatas: list[dict] = [records[id_][1] for id_ in ids]
+    timings["fetch"] = time.perf_counter() - step
+
+    return {
+        "ids": ids,
+        "permalink": permalink,
+        "embedding": None if query_embeddings is None else query_embeddings[0],
+        "distances": [distances.get(id_) for id_ in ids],
+        "documents": documents,
+        "metadatas": metadatas,
+        "augmented_prompt": get_augmented_prompt(
+            prompt=prompt,
+            documents=documents,
+            metadatas=metadatas,
+        ),
+        "stats": {
+            "path": (
+                "citation"
+                if permalink is not None
+                else "hybrid"
+                if index is not None
+                else "vector"
+            ),
+            "elapsed": time.perf_counter() - start,
+            "timings": timings,
+            "sources": dict(Counter(sources[id_] for id_ in ids)),
+        },
+    }
+
+
+def get_history() -> list[str]:
+    return [f"{x['role']}({x['content']})" for x in st.session_state["msgs"][-5:-1]]
+
+
+def answer_stream(
     prompt: str,
-    query_result: chromadb.QueryResult,
-) -> str:
-    if st.session_state["show_retrieved"]:
+    retrieval: dict,
+    generate: Callable[[], Iterable[str | None]],
+) -> Iterator[str | None]:
+    start: float = time.perf_counter()
+    answer_cache: answer.AnswerCache = get_answer_cache()
+    query_embedding: typing.Any = retrieval.pop("embedding", None)
+    key: dict | None = None
+    distance: float | None = None
+
+    if st.session_state["direct_answer"] and (
+        direct := answer.direct_answer(
+            distances=retrieval["distances"],
+            metadatas=retrieval["metadatas"],
+            threshold=st.session_state["direct_answer_distance"],
+        )
+    ):
+        mode = "direct"
+        text, distance = direct
+        yield from answer.replay(text=text)
+    elif st.session_state["use_answer_cache"] and (
+        cached := answer_cache.get(
+            **(
+                key := {
+                    "embedding": query_embedding,
+                    "model": st.session_state["model"],
+                    "include": st.session_state["include"],
+                    "doc_ids": (
+                        [retrieval["permalink"]]
+                        if retrieval["permalink"] is not None
+                        else retrieval["ids"]
+                    ),
+                    "history": flight.key(*get_history()),
+                    "question": prompt,
+                }
+            ),
+        )
+    ):
+        mode = "cache"
+        retrieval["stats"]["answer_cache"] = f"hit ({cached.similarity:.3f})"
+        yield from answer.replay(text=cached.answer)
+    else:
+        mode = "llm"
+        chunks: list[str] = []
+
+        for chunk in generate():
+            chunks.append(chunk or "")
+            yield chunk
+
+        if key is not None:
+            retrieval["stats"]["answer_cache"] = "miss"
+            answer_cache.put(**key, answer="".join(chunks))
+
+    retrieval["stats"]["answer_mode"] = mode
+    retrieval["stats"]["answer_elapsed"] = time.perf_counter() - start
+    answer_cache.log(
+        mode=mode,
+        model=st.session_state["model"],
+        elapsed=retrieval["stats"]["answer_elapsed"],
+        distance=distance,
+    )
+
+
+def answer_cache_status() -> str:
+    answer_cache: answer.AnswerCache = get_answer_cache()
+    entries, hits = answer_cache.summary()
+
+    return (
+        f"Cache jawaban: {answer_cache.hit_rate:.0%} hit rate "
+        f"({answer_cache.hits} hit, {answer_cache.misses} miss sejak sync terakhir), "
+        f"{entries} entri, {hits} hit total. {get_single_flight().stats} Jawaban: "
+        + (
+            ", ".join(
+                f"{mode} {count} (rata-rata {elapsed:.2f} detik)"
+                for mode, count, elapsed in answer_cache.modes()
+            )
+            or "-"
+        )
+        + "."
+    )
+
+
+def show_retrieval(retrieval: dict) -> None:
+    if st.session_state["show_retrieved"] and (stats := retrieval.get("stats")):
+        st.caption(
+            body="Pencarian {} dalam {:.0f} ms ({}), sumber: {}{}".format(
+                stats["path"],
+                stats["elapsed"] * 1000,
+                ", ".join(
+                    f"{name} {elapsed * 1000:.0f} ms"
+                    for name, elapsed in stats["timings"].items()
+                ),
+                ", ".join(
+                    f"{source} {count}" for source, count in stats["sources"].items()
+                )
+                or "-",
+                (
+                    f", jawaban {stats['answer_mode']} dalam "
+                    f"{stats['answer_elapsed']:.2f} detik"
+                    if "answer_mode" in stats
+                    else ""
+                )
+                + (
+                    f", cache jawaban: {cache}"
+                    if (cache := stats.get("answer_cache"))
+                    else ""
+                ),
+            ),
+        )
+
+    if st.session_state["show_retrieved"] and retrieval["documents"]:
         for tab, document, metadata in zip(
             st.tabs(
                 tabs=[
-                    f"Dokumen {x}" for x in range(1, st.session_state["n_results"] + 1)
+                    f"Dokumen {x}" for x in range(1, len(retrieval["documents"]) + 1)
                 ],
             ),
-            query_result["documents"][0],
-            query_result["metadatas"][0],
+            retrieval["documents"],
+            retrieval["metadatas"],
             strict=True,
         ):
             with tab:
@@ -91,14 +335,8 @@ def get_augmented_prompt(
                         metadata["nomor_peraturan"],
                         metadata["permalink"],
                         ", ".join(
-                            result[0]
-                            if (
-                                result := get_df(
-                                    source="var/03_final/topic.csv",
-                                ).filter(pl.col(name="uuid") == int(uuid))["keterangan"]
-                            ).shape
-                            else None
-                            for uuid in metadata["topik"].split(" ")
+                            str(object=label)
+                            for label in get_topic_labels(topik=metadata["topik"])
                         ),
                     ),
                 )
@@ -110,44 +348,30 @@ def get_augmented_prompt(
                     ),
                 )
 
-    augmented_prompt: str = (
-        """
-Konteks yang Tersedia:
-{}
-
-Pertanyaan Pengguna:
-{}
-""".replace("  ", "")
-        .strip()
-        .format(
-            "\n".join(
-                [
-                    "- {} {} [Sumber: {} Nomor: {}] ".format(
-                        question,
-                        meta_data["answer"],
-                        meta_data["jenis_peraturan"],
-                        meta_data["nomor_peraturan"],
-                    )
-                    for question, meta_data in zip(
-                        query_result["documents"][0],
-                        query_result["metadatas"][0],
-                        strict=True,
-                    )
-                ],
-            ),
-            prompt,
-        )
-    )
-
     if st.session_state["show_augmented"]:
-        st.code(body=augmented_prompt, wrap_lines=True)
+        st.code(body=retrieval["augmented_prompt"], wrap_lines=True)
+
 
-    return augmented_prompt
+def get_mtime(source: str) -> float:
+    return max(
+        (
+            path.stat().st_mtime
+            for path in [Path(source), Path(source).with_suffix(suffix=".csv")]
+            if path.exists()
+        ),
+        default=0.0,
+    )
 
 
-@st.cache_data
-def get_df(source: str) -> pl.DataFrame:
+@st.cache_resource(max_entries=16)
+def load_df(
+    source: str,
+    columns: tuple[str, ...] | None,
+    mtime: float,  # noqa: ARG001
+) -> pl.DataFrame:
     match Path(source).suffix:
+        case ".parquet":
+            return store.scan(path=Path(source)).select(columns or pl.all()).collect()
         case ".csv":
             return pl.read_csv(source=source)
         case ".json":
@@ -156,6 +380,248 @@ def get_df(source: str) -> pl.DataFrame:
             raise ValueError(f"Unsupported file extension: {source}")
 
 
+def get_df(source: str, columns: list[str] | None = None) -> pl.DataFrame:
+    return load_df(
+        source=source,
+        columns=tuple(columns) if columns else None,
+        mtime=get_mtime(source=source),
+    )
+
+
+@st.cache_resource(max_entries=1)
+def load_topic_index(mtime: float) -> dict[int, str]:  # noqa: ARG001
+    return dict(
+        get_df(source="var/03_final/topic.parquet")
+        .select("uuid", "keterangan")
+        .iter_rows(),
+    )
+
+
+def get_topic_index() -> dict[int, str]:
+    return load_topic_index(mtime=get_mtime(source="var/03_final/topic.parquet"))
+
+
+def get_topic_labels(topik: str) -> list[str | None]:
+    return [get_topic_index().get(int(uuid)) for uuid in topik.split(" ")]
+
+
+@st.cache_resource(max_entries=1)
+def load_regulation_index(mtime: float) -> dict[str, int]:  # noqa: ARG001
+    return {
+        permalink: i
+        for i, permalink in enumerate(
+            iterable=get_df(
+                source="var/03_final/regulation.parquet",
+                columns=["permalink"],
+            )["permalink"],
+        )
+    }
+
+
+def get_regulation_index() -> dict[str, int]:
+    return load_regulation_index(
+        mtime=get_mtime(source="var/03_final/regulation.parquet"),
+    )
+
+
+def get_regulation_body(permalink: str) -> str | None:
+    if (i := get_regulation_index().get(permalink)) is None:
+        return None
+
+    return (
+        store.scan(path=Path("var/03_final/regulation.parquet"))
+        .slice(offset=i, length=1)
+        .select("body_final")
+        .collect()
+        .item()
+    )
+
+
+@st.cache_resource(max_entries=1)
+def load_lexical_index(generation: int) -> lexical.LexicalIndex | None:  # noqa: ARG001
+    return lexical.LexicalIndex.load(path=Path("var/03_final"))
+
+
+def get_lexical_index() -> lexical.LexicalIndex | None:
+    return load_lexical_index(generation=get_generation())
+
+
+@st.cache_resource(max_entries=1)
+def load_answer_cache(generation: int) -> answer.AnswerCache:
+    answer_cache = answer.AnswerCache(generation=generation)
+    answer_cache.evict()
+
+    return answer_cache
+
+
+def get_answer_cache() -> answer.AnswerCache:
+    return load_answer_cache(generation=get_generation())
+
+
+def get_generation() -> int:
+    return store.generation(path=Path("var/03_final"))
+
+
+@st.cache_resource(max_entries=1)
+def get_chroma_client(generation: int) -> chromadb.ClientAPI:
+    identifier: str = f".chroma@{generation}"
+    systems: dict = SharedSystemClient._identifier_to_system
+
+    systems[".chroma"] = SharedSystemClient._create_system_if_not_exists(
+        identifier=identifier,
+        settings=chromadb.config.Settings(
+            anonymized_telemetry=False,
+            is_persistent=True,
+            persist_directory=".chroma",
+        ),
+    )
+    systems.pop(identifier)
+
+    return chromadb.PersistentClient(
+        path=".chroma",
+        settings=chromadb.config.Settings(anonymized_telemetry=False),
+    )
+
+
+@st.cache_resource(max_entries=1)
+def load_collection(generation: int) -> chromadb.Collection:
+    return get_chroma_client(generation=generation).get_collection(name="tax-rag")
+
+
+def get_collection() -> chromadb.Collection:
+    return load_collection(generation=get_generation())
+
+
+@st.cache_resource
+def get_key_pool() -> keypool.KeyPool:
+    return keypool.KeyPool(api_keys=list(st.secrets["api_keys"]))
+
+
+@st.cache_resource
+def get_single_flight() -> flight.SingleFlight:
+    return flight.SingleFlight()
+
+
+def generate_stream(lane: str = "chat", **kwargs: typing.Any) -> Iterator[str | None]:
+    pool: keypool.KeyPool = get_key_pool()
+
+    def upstream() -> Iterator[str | None]:
+        with pool.lease(lane=lane) as lease:
+            for chunk in lease.client.models.generate_content_stream(**kwargs):
+                yield chunk.text
+
+    return get_single_flight().stream(
+        key=flight.key(
+            kwargs["model"],
+            kwargs["contents"],
+            kwargs.get("config"),
+        ),
+        generate=upstream,
+    )
+
+
+@st.fragment(run_every=5)
+def key_pool_status() -> None:
+    st.dataframe(
+        data=[
+            {"utilisation": usage.utilisation, **usage.model_dump()}
+            for usage in get_key_pool().usage()
+        ],
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "utilisation": st.column_config.ProgressColumn(
+                label="Terpakai",
+                min_value=0.0,
+                max_value=1.0,
+            ),
+        },
+    )
+
+
+@st.cache_resource(ttl="12h")
+def get_auth0() -> Auth0:
+    return Auth0(
+        domain=(domain := st.secrets["auth"]["auth0"]["domain"]),
+        token=GetToken(
+            domain=domain,
+            client_id=st.secrets["auth"]["auth0"]["client_id"],
+            client_secret=st.secrets["auth"]["auth0"]["client_secret"],
+        ).client_credentials(audience=f"https://{domain}/api/v2/")["access_token"],
+    )
+
+
+@st.cache_resource
+def load_facets(path: str, mtime: float) -> dict:  # noqa: ARG001
+    return facet.load(path=Path(path))
+
+
+def get_facets(source: str = "var/03_final/facet.json") -> dict:
+    if not (path := Path(source)).exists():
+        facet.write(
+            frame=store.scan(path=path.with_name(name="regulation.parquet")),
+            path=path,
+        )
+
+    return load_facets(path=source, mtime=path.stat().st_mtime)
+
+
+def get_facet_values(field: str) -> list[str]:
+    return facet.values(index=get_facets(), field=field)
+
+
+@st.cache_resource
+def get_embedder(model: str) -> embedding.Embedder:
+    return embedding.Embedder(model=model, cache=embedding.EmbeddingCache())
+
+
+def embed_query(collection: chromadb.Collection, text: str) -> list:
+    return get_embedder(
+        model=(collection.metadata or {}).get(
+            embedding.METADATA_KEY,
+            embedding.DEFAULT_MODEL,
+        ),
+    )(texts=[text])
+
+
+@st.cache_resource
+def get_job_queue() -> jobs.JobQueue:
+    return jobs.JobQueue()
+
+
+@st.fragment(run_every=2)
+def sync_status() -> None:
+    if (job := get_job_queue().latest(kind="sync")) is None:
+        return
+
+    match job.status:
+        case "queued":
+            st.info(body=f"Sync #{job.id} menunggu pekerja.", icon="⏳")
+        case "running":
+            st.info(
+                body=f"Sync #{job.id} berjalan {job.elapsed:.0f} detik: {job.progress}",
+                icon="🔄",
+            )
+        case "done":
+            st.success(
+                body=f"Sync #{job.id} selesai dalam {job.elapsed:.2f} detik.",
+                icon="✅",
+            )
+        case _:
+            st.error(body=f"Sync #{job.id} gagal.", icon="🚨")
+
+    if not job.is_active:
+        with st.expander(label="Detail sync terakhir"):
+            if job.result:
+                st.text(body=job.result)
+
+            if job.timings:
+                st.json(body=job.timings)
+
+            if job.error:
+                st.code(body=job.error)
+
+
 @st.dialog(title="Kelola Peran Pengguna", width="large")
 def manage_user_roles(auth0: Auth0, current_user_id: str) -> None:
     users = auth0.users.list(
@@ -215,119 +681,3 @@ def manage_user_roles(auth0: Auth0, current_user_id: str) -> None:
                     )
 
                 st.rerun()
-
-
-async def req_list_regs(page: int, limit: int) -> httpx.Response:
-    async with httpx.AsyncClient(timeout=60) as client:
-        return await client.post(
-            url=f"{toml.load(f='.env.toml')['url']['base']}/api/req-be",
-            json={
-                "method": "post",
-                "url": f"{toml.load(f='.env.toml')['url']['index']}",
-                "data": {
-                    "sorted_by": "tanggal_efektif[desc]",
-                    "pagination": {"page": page, "limit": limit},
-                },
-            },
-        )
-
-
-async def get_all_list_regs(limit: int) -> dict[str, typing.Any]:
-    first: httpx.Response = await req_list_regs(page=1, limit=limit)
-
-    data: dict[str, typing.Any] = first.json()["data"]["search_data"]
-
-    tasks: list = []
-
-    async with asyncio.TaskGroup() as tg:
-        tasks.extend(
-            [
-                tg.create_task(coro=req_list_regs(page=page, limit=limit))
-                for page in range(2, first.json()["pagination"]["total_page"] + 1)
-            ],
-        )
-
-    for task in tasks:
-        data.extend(task.result().json()["data"]["search_data"])
-
-    return data
-
-
-def get_detail_reg(permalink: str) -> dict[str, typing.Any]:
-    with httpx.Client(timeout=60) as client:
-        while True:
-            try:
-                response: httpx.Response = client.post(
-                    url=f"{toml.load(f='.env.toml')['url']['base']}/api/req-be",
-                    json={
-                        "method": "post",
-                        "url": f"{toml.load(f='.env.toml')['url']['detail']}",
-                        "data": {"permalink": permalink},
-                    },
-                )
-                if response.status_code == 200:
-                    return response.json()["data"][0]
-            except Exception as e:
-                print(permalink, e)  # noqa: T201
-                time.sleep(0.1)
-
-
-def strip_html_tags(data: str) -> str:
-    return html.fromstring(html=data.replace(">", "> ")).text_content()
-
-
-class QAItem(pydantic.BaseModel):
-    question: str
-    answer: str
-
-
-class QAList(pydantic.BaseModel):
-    qa_list: list[QAItem]
-
-
-counter = 0
-
-
-def generate_qa_list(regulation: str) -> list[QAItem]:
-    global counter
-    counter += 1
-
-    while True:
-        try:
-            response: types.GenerateContentResponse = genai.Client(
-                api_key=random.choice(seq=toml.load(f=".env.toml")["api_keys"]),
-            ).models.generate_content(
-                model="gemini-2.0-flash-lite",
-                contents=regulation,
-                config=types.GenerateContentConfig(
-                    system_instruction="""
-Buatlah daftar pertanyaan dan jawaban yang menyeluruh berdasarkan isi peraturan yang
-diberikan, dalam bahasa Indonesia yang jelas dan mudah dipahami.
-
-Keluaran yang diharapkan adalah dalam bentuk JSON array, di mana setiap item adalah
-objek yang memiliki dua field:
-- "question": pertanyaan yang relevan dan penting terkait dengan isi peraturan, yang
-dapat mencakup aspek-aspek seperti tujuan peraturan, definisi istilah penting, kewajiban
-atau hak yang diatur, sanksi atau konsekuensi pelanggaran, dan lain-lain.
-- "answer": jawaban lengkap dan informatif yang menjawab pertanyaan tersebut,
-berdasarkan isi peraturan yang diberikan. Jawaban harus mencakup informasi penting dari
-peraturan, dan harus ditulis dalam bahasa Indonesia yang formal dan mudah dipahami.
-Pastikan untuk tidak mengulangi pertanyaan dalam jawaban, dan fokus pada memberikan
-jawaban yang tepat dan relevan.
-""",
-                    temperature=0.1,
-                    response_mime_type="application/json",
-                    response_schema=QAList,
-                ),
-            )
-
-            qa_list: list[QAItem] = QAList.model_validate_json(
-                json_data=response.text,
-            ).qa_list
-
-            print(f"{counter:> 5}, {len(qa_list):> 5} pasang pertanyaan-jawaban.")  # noqa: T201
-
-            return qa_list
-
-        except Exception as e:
-            print(e)  # noqa: T201
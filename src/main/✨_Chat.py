@@ -1,12 +1,22 @@
 import json
-import random
 
 import chromadb
 import streamlit as st
-from google import genai
 from google.genai import types
 from sqlmodel import Field, Session, SQLModel, create_engine, select
-from utils import get_augmented_prompt, get_timestamp, profile_card
+from utils import (
+    DIRECT_ANSWER_DISTANCE,
+    answer_cache_status,
+    answer_stream,
+    generate_stream,
+    get_collection,
+    get_facet_values,
+    get_history,
+    get_timestamp,
+    profile_card,
+    retrieve,
+    show_retrieval,
+)
 
 SQLModel.__table_args__ = {"extend_existing": True}
 
@@ -128,16 +138,11 @@ with st.sidebar:
             help="Dokumen teratas yang digunakan untuk menjawab (1-10)",
         )
 
-        collection: chromadb.Collection = chromadb.PersistentClient(
-            path=".chroma",
-            settings=chromadb.config.Settings(anonymized_telemetry=False),
-        ).get_collection(name="tax-rag")
+        collection: chromadb.Collection = get_collection()
 
         st.session_state["include"] = st.multiselect(
             label="Status peraturan yang disertakan",
-            options=sorted(
-                {x["status_dokumen"] for x in collection.get()["metadatas"]},
-            ),
+            options=get_facet_values(field="status_dokumen"),
             default=["Berlaku"],
             help="Status peraturan yang disertakan dalam pencarian.",
         )
@@ -154,19 +159,38 @@ with st.sidebar:
             help="Tampilkan prompt yang dihasilkan dari dokumen yang diambil.",
         )
 
+        st.session_state["use_answer_cache"] = st.toggle(
+            label="Gunakan cache jawaban",
+            value=True,
+            help="Pakai ulang jawaban untuk pertanyaan yang sangat mirip dengan "
+            "dokumen yang sama sejak sync terakhir.",
+        )
+
+        st.session_state["direct_answer"] = st.toggle(
+            label="Jawaban langsung",
+            value=True,
+            help="Tampilkan jawaban tersimpan tanpa memanggil model jika pertanyaan "
+            "hampir sama dengan pertanyaan di basis data.",
+        )
+
+        st.session_state["direct_answer_distance"] = st.number_input(
+            label="Ambang jarak jawaban langsung:",
+            min_value=0.0,
+            max_value=2.0,
+            value=DIRECT_ANSWER_DISTANCE,
+            step=0.01,
+            disabled=not st.session_state["direct_answer"],
+            help="Jarak maksimum dokumen teratas agar jawabannya dipakai langsung.",
+        )
+
+        st.caption(body=answer_cache_status())
+
 st.title(body="✨ Chat")
 
-for i, msg in enumerate(iterable=st.session_state["msgs"]):
+for msg in st.session_state["msgs"]:
     with st.chat_message(name=msg["role"]):
-        if msg["role"] == "assistant":
-            get_augmented_prompt(
-                prompt=st.session_state["msgs"][i - 1]["content"],
-                query_result=collection.query(
-                    query_texts=st.session_state["msgs"][i - 1]["content"],
-                    n_results=st.session_state["n_results"],
-                    where={"status_dokumen": {"$in": st.session_state["include"]}},
-                ),
-            )
+        if msg["role"] == "assistant" and "retrieval" in msg:
+            show_retrieval(retrieval=msg["retrieval"])
 
         st.markdown(body=msg["content"])
 
@@ -176,29 +200,17 @@ if prompt := st.chat_input():
     st.chat_message(name="user").markdown(body=prompt)
 
     with st.chat_message(name="assistant"):
-        augmented_prompt: str = get_augmented_prompt(
-            prompt=prompt,
-            query_result=collection.query(
-                query_texts=prompt,
-                n_results=st.session_state["n_results"],
-                where={"status_dokumen": {"$in": st.session_state["include"]}},
-            ),
+        show_retrieval(
+            retrieval=(retrieval := retrieve(collection=collection, prompt=prompt)),
         )
 
         response: str = st.write_stream(
-            stream=(
-                chunk.text
-                for chunk in genai.Client(
-                    api_key=random.choice(seq=st.secrets["api_keys"]),
-                ).models.generate_content_stream(
+            stream=answer_stream(
+                prompt=prompt,
+                retrieval=retrieval,
+                generate=lambda: generate_stream(
                     model=st.session_state["model"],
-                    contents=[
-                        *(
-                            f"{x['role']}({x['content']})"
-                            for x in st.session_state["msgs"][-5:-1]
-                        ),
-                        augmented_prompt,
-                    ],
+                    contents=[*get_history(), retrieval["augmented_prompt"]],
                     config=types.GenerateContentConfig(
                         temperature=0.1,
                         system_instruction="""
@@ -215,11 +227,13 @@ sebelumnya, maka abaikan riwayat chat tersebut.
 dengan perpajakan. Silakan ajukan pertanyaan lain yang berkaitan dengan perpajakan."
 """,
                     ),
-                )
+                ),
             ),
         )
 
-    st.session_state["msgs"].append({"role": "assistant", "content": response})
+    st.session_state["msgs"].append(
+        {"role": "assistant", "content": response, "retrieval": retrieval},
+    )
 
     if st.user["is_logged_in"]:
         with Session(bind=engine) as session:
@@ -0,0 +1,307 @@
+import datetime
+import itertools
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import flight
+import numpy as np
+import pydantic
+
+SIMILARITY_THRESHOLD = 0.95
+
+DIRECT_ANSWER_DISTANCE = 0.1
+
+TTL = datetime.timedelta(days=7)
+
+MAX_ENTRIES = 5000
+
+SCHEMA_VERSION = 4
+
+
+class CachedAnswer(pydantic.BaseModel):
+    question: str
+    answer: str
+    similarity: float
+    created_at: float
+    hits: int
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        path: Path = Path("var/00_cache/answer.sqlite3"),
+        generation: int = 0,
+        threshold: float = SIMILARITY_THRESHOLD,
+        ttl: datetime.timedelta = TTL,
+        max_entries: int = MAX_ENTRIES,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.generation: int = generation
+        self.threshold: float = threshold
+        self.ttl: datetime.timedelta = ttl
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database=path, check_same_thread=False)
+
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != (
+            SCHEMA_VERSION
+        ):
+            self.connection.executescript(
+                f"DROP TABLE IF EXISTS answer; PRAGMA user_version = {SCHEMA_VERSION};",
+            )
+
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answer (
+                id INTEGER PRIMARY KEY,
+                model TEXT NOT NULL,
+                include TEXT NOT NULL,
+                doc_ids TEXT NOT NULL,
+                history TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                question_key TEXT NOT NULL,
+                embedding BLOB,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+        )
+        self.connection.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS answer_key "
+            "ON answer (model, include, doc_ids, history, generation, question_key)",
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answer_log (
+                created_at REAL NOT NULL,
+                mode TEXT NOT NULL,
+                model TEXT NOT NULL,
+                elapsed REAL NOT NULL,
+                distance REAL
+            )
+            """,
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0
+
+    @staticmethod
+    def key(
+        model: str,
+        include: list[str],
+        doc_ids: list[str],
+        history: str,
+    ) -> tuple[str, str, str, str]:
+        return model, json.dumps(obj=sorted(include)), json.dumps(obj=doc_ids), history
+
+    def get(
+        self,
+        embedding: np.ndarray | None,
+        model: str,
+        include: list[str],
+        doc_ids: list[str],
+        history: str,
+        question: str,
+    ) -> CachedAnswer | None:
+        query: np.ndarray | None = (
+            None if embedding is None else np.asarray(a=embedding, dtype=np.float32)
+        )
+        best: CachedAnswer | None = None
+        best_id: int | None = None
+
+        with self.lock:
+            for (
+                id_,
+                cached_question,
+                vector,
+                answer,
+                created_at,
+                hits,
+            ) in self.connection.execute(
+                "SELECT id, question, embedding, answer, created_at, hits FROM answer "
+                "WHERE model = ? AND include = ? AND doc_ids = ? AND history = ? "
+                "AND generation = ? AND created_at > ? AND (embedding IS NULL) = ? "
+                "AND (embedding IS NOT NULL OR question_key = ?)",
+                (
+                    *self.key(
+                        model=model,
+                        include=include,
+                        doc_ids=doc_ids,
+                        history=history,
+                    ),
+                    self.generation,
+                    time.time() - self.ttl.total_seconds(),
+                    query is None,
+                    flight.normalise(value=question),
+                ),
+            ):
+                if query is None:
+                    similarity = 1.0
+                else:
+                    cached: np.ndarray = np.frombuffer(buffer=vector, dtype=np.float32)
+                    similarity = float(
+                        np.dot(query, cached)
+                        / (np.linalg.norm(query) * np.linalg.norm(cached) or 1.0),
+                    )
+
+                if similarity >= self.threshold and (
+                    best is None or similarity > best.similarity
+                ):
+                    best_id = id_
+                    best = CachedAnswer(
+                        question=cached_question,
+                        answer=answer,
+                        similarity=similarity,
+                        created_at=created_at,
+                        hits=hits + 1,
+                    )
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE answer SET used_at = ?, hits = hits + 1 WHERE id = ?",
+                    (time.time(), best_id),
+                )
+
+        return best
+
+    def put(
+        self,
+        embedding: np.ndarray | None,
+        model: str,
+        include: list[str],
+        doc_ids: list[str],
+        history: str,
+        question: str,
+        answer: str,
+    ) -> None:
+        now: float = time.time()
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO answer (model, include, doc_ids, history, generation, "
+                "question, question_key, embedding, answer, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (model, include, doc_ids, history, generation, "
+                "question_key) DO UPDATE SET question = excluded.question, "
+                "embedding = excluded.embedding, answer = excluded.answer, "
+                "created_at = excluded.created_at, used_at = excluded.used_at",
+                (
+                    *self.key(
+                        model=model,
+                        include=include,
+                        doc_ids=doc_ids,
+                        history=history,
+                    ),
+                    self.generation,
+                    question,
+                    flight.normalise(value=question),
+                    None
+                    if embedding is None
+                    else np.asarray(a=embedding, dtype=np.float32).tobytes(),
+                    answer,
+                    now,
+                    now,
+                ),
+            )
+
+        self.evict()
+
+    def evict(self) -> int:
+        with self.lock, self.connection:
+            removed: int = self.connection.execute(
+                "DELETE FROM answer WHERE generation != ? OR created_at <= ?",
+                (self.generation, time.time() - self.ttl.total_seconds()),
+            ).rowcount
+
+            return (
+                removed
+                + self.connection.execute(
+                    "DELETE FROM answer WHERE id NOT IN "
+                    "(SELECT id FROM answer ORDER BY used_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                ).rowcount
+            )
+
+    def log(
+        self,
+        mode: str,
+        model: str,
+        elapsed: float,
+        distance: float | None = None,
+    ) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO answer_log VALUES (?, ?, ?, ?, ?)",
+                (time.time(), mode, model, elapsed, distance),
+            )
+
+    def modes(self) -> list[tuple[str, int, float]]:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT mode, COUNT(*), AVG(elapsed) FROM answer_log "
+                "GROUP BY mode ORDER BY mode",
+            ).fetchall()
+
+    def summary(self) -> tuple[int, int]:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM answer",
+            ).fetchone()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def direct_answer(
+    distances: list[float | None],
+    metadatas: list[dict],
+    threshold: float = DIRECT_ANSWER_DISTANCE,
+) -> tuple[str, float] | None:
+    nearest: tuple[float, dict] | None = min(
+        (
+            (distance, metadata)
+            for distance, metadata in zip(distances, metadatas, strict=True)
+            if distance is not None
+        ),
+        key=lambda item: item[0],
+        default=None,
+    )
+
+    if nearest is None or nearest[0] > threshold:
+        return None
+
+    return (
+        "{}\n\n[Sumber: {} Nomor: {}]".format(
+            nearest[1]["answer"],
+            nearest[1]["jenis_peraturan"],
+            nearest[1]["nomor_peraturan"],
+        ),
+        nearest[0],
+    )
+
+
+def replay(text: str, words: int = 8) -> Iterator[str]:
+    for batch in itertools.batched(
+        re.findall(pattern=r"\S+\s*", string=text),
+        n=words,
+        strict=False,
+    ):
+        yield "".join(batch)
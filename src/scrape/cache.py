@@ -0,0 +1,137 @@
+import datetime
+import gzip
+import hashlib
+import json
+import sqlite3
+import time
+import typing
+from pathlib import Path
+
+import httpx
+import pydantic
+
+
+class CacheEntry(pydantic.BaseModel):
+    key: str
+    sha256: str
+    fetched_at: float
+    etag: str | None
+    last_modified: str | None
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Path = Path("var/00_cache"),
+        ttl: datetime.timedelta | None = None,
+    ) -> None:
+        (path / "blobs").mkdir(parents=True, exist_ok=True)
+
+        self.path: Path = path
+        self.ttl: datetime.timedelta | None = ttl
+        self.connection = sqlite3.connect(database=path / "index.sqlite3")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                permalink TEXT,
+                params TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            )
+            """,
+        )
+
+    @staticmethod
+    def key(endpoint: str, params: dict[str, typing.Any]) -> str:
+        return hashlib.sha256(
+            string=json.dumps(
+                obj={"endpoint": endpoint, "params": params},
+                sort_keys=True,
+            ).encode(),
+        ).hexdigest()
+
+    def blob(self, sha256: str) -> Path:
+        return self.path / "blobs" / sha256[:2] / f"{sha256}.json.gz"
+
+    def lookup(self, endpoint: str, params: dict[str, typing.Any]) -> CacheEntry | None:
+        row: tuple | None = self.connection.execute(
+            "SELECT key, sha256, fetched_at, etag, last_modified FROM response "
+            "WHERE key = ?",
+            (self.key(endpoint=endpoint, params=params),),
+        ).fetchone()
+
+        if row is None or not self.blob(sha256=row[1]).exists():
+            return None
+
+        return CacheEntry(
+            key=row[0],
+            sha256=row[1],
+            fetched_at=row[2],
+            etag=row[3],
+            last_modified=row[4],
+        )
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return (
+            self.ttl is None
+            or time.time() - entry.fetched_at < self.ttl.total_seconds()
+        )
+
+    def load(self, entry: CacheEntry) -> typing.Any:
+        return json.loads(
+            s=gzip.decompress(data=self.blob(sha256=entry.sha256).read_bytes()),
+        )
+
+    def store(
+        self,
+        endpoint: str,
+        params: dict[str, typing.Any],
+        content: bytes,
+        headers: httpx.Headers,
+    ) -> None:
+        sha256: str = hashlib.sha256(string=content).hexdigest()
+
+        if not (blob := self.blob(sha256=sha256)).exists():
+            blob.parent.mkdir(exist_ok=True)
+            blob.write_bytes(data=gzip.compress(data=content))
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(endpoint=endpoint, params=params),
+                    endpoint,
+                    params.get("permalink"),
+                    json.dumps(obj=params, sort_keys=True),
+                    sha256,
+                    time.time(),
+                    headers.get("etag"),
+                    headers.get("last-modified"),
+                ),
+            )
+
+    def touch(self, entry: CacheEntry) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE response SET fetched_at = ? WHERE key = ?",
+                (time.time(), entry.key),
+            )
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry | None) -> dict[str, str]:
+        headers: dict[str, str] = {}
+
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        return headers
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,76 @@
+import itertools
+import multiprocessing
+import os
+import typing
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import polars as pl
+from lxml import etree, html
+
+
+def html_to_text(data: str | None) -> str | None:
+    if data is None:
+        return None
+
+    try:
+        text: str = html.fromstring(html=data.replace(">", "> ")).text_content()
+    except etree.ParserError:
+        return ""
+
+    return " ".join(text.split())
+
+
+def html_to_text_batch(batch: Sequence[str | None]) -> list[str | None]:
+    return [html_to_text(data=data) for data in batch]
+
+
+def pool(workers: int | None = None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers or os.process_cpu_count() or 1,
+        mp_context=multiprocessing.get_context(method="spawn"),
+    )
+
+
+def html_to_texts(
+    values: Iterable[str | None],
+    workers: int | None = None,
+    batch_size: int = 64,
+    executor: ProcessPoolExecutor | None = None,
+) -> list[str | None]:
+    values: list[str | None] = list(values)
+    workers: int = workers or os.process_cpu_count() or 1
+
+    if len(values) <= batch_size or (executor is None and workers == 1):
+        return html_to_text_batch(batch=values)
+
+    if executor is None:
+        with pool(workers=workers) as executor:
+            return html_to_texts(
+                values=values,
+                batch_size=batch_size,
+                executor=executor,
+            )
+
+    return list(
+        itertools.chain.from_iterable(
+            executor.map(
+                html_to_text_batch,
+                itertools.batched(values, batch_size, strict=False),
+            ),
+        ),
+    )
+
+
+def with_clean_text(
+    df: pl.DataFrame,
+    column: str = "body_final",
+    **kwargs: typing.Any,
+) -> pl.DataFrame:
+    return df.with_columns(
+        pl.Series(
+            name=column,
+            values=html_to_texts(values=df.get_column(name=column), **kwargs),
+            dtype=pl.Utf8,
+        ),
+    )
@@ -0,0 +1,514 @@
+import asyncio
+import datetime
+import functools
+import random
+import time
+import typing
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+import httpx
+import polars as pl
+import pydantic
+import toml
+from cache import CacheEntry, ResponseCache
+
+DETAIL_TTL = datetime.timedelta(days=1)
+
+RETRYABLE_STATUS = (httpx.codes.REQUEST_TIMEOUT, httpx.codes.TOO_MANY_REQUESTS)
+
+RELATED_DTYPE = pl.List(
+    inner=pl.Struct(fields=[pl.Field(name="permalink", dtype=pl.Utf8)]),
+)
+
+DETAIL_DTYPE = pl.Struct(
+    fields=[
+        pl.Field(name="jenis_peraturan", dtype=pl.Utf8),
+        pl.Field(name="nomor_peraturan", dtype=pl.Utf8),
+        pl.Field(name="body_final", dtype=pl.Utf8),
+        pl.Field(name="peraturan_terbaru", dtype=RELATED_DTYPE),
+        pl.Field(name="peraturan_sebelumnya", dtype=RELATED_DTYPE),
+        pl.Field(name="peraturan_relevan", dtype=RELATED_DTYPE),
+        pl.Field(
+            name="meta",
+            dtype=pl.Struct(fields=[pl.Field(name="keywords", dtype=pl.Utf8)]),
+        ),
+    ],
+)
+
+
+@functools.cache
+def load_config(path: str = ".env.toml") -> dict[str, typing.Any]:
+    return toml.load(f=path)
+
+
+def parse_tanggal(value: str) -> datetime.date:
+    return (
+        datetime.datetime.strptime(value, "%d-%m-%Y")
+        .replace(tzinfo=datetime.UTC)
+        .date()
+    )
+
+
+class Watermark(pydantic.BaseModel):
+    tanggal_efektif: datetime.date | None = None
+    permalinks: set[str] = set()
+    full_crawl_at: datetime.datetime | None = None
+
+    @classmethod
+    def load(cls, path: Path) -> typing.Self:
+        return (
+            cls.model_validate_json(json_data=path.read_text())
+            if path.exists()
+            else cls()
+        )
+
+    def save(self, path: Path) -> None:
+        path.write_text(data=self.model_dump_json())
+
+    def needs_full_crawl(self, interval: datetime.timedelta) -> bool:
+        return (
+            self.full_crawl_at is None
+            or datetime.datetime.now(tz=datetime.UTC) - self.full_crawl_at >= interval
+        )
+
+    def is_known(self, item: dict[str, typing.Any]) -> bool:
+        return (
+            self.tanggal_efektif is not None
+            and item["permalink"] in self.permalinks
+            and parse_tanggal(value=item["tanggal_efektif"]) <= self.tanggal_efektif
+        )
+
+    def advance(
+        self,
+        permalinks: Iterable[str],
+        tanggal_efektif: datetime.date | None,
+        *,
+        full: bool,
+    ) -> "Watermark":
+        return Watermark(
+            tanggal_efektif=tanggal_efektif,
+            permalinks=set(permalinks),
+            full_crawl_at=(
+                datetime.datetime.now(tz=datetime.UTC) if full else self.full_crawl_at
+            ),
+        )
+
+
+class CrawlStats(pydantic.BaseModel):
+    unit: str = "halaman"
+    pages: int = 0
+    bytes_read: int = 0
+    retries: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    elapsed: float = 0.0
+    concurrency: float = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_sec(self) -> float:
+        return self.bytes_read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.pages} {self.unit}, {self.bytes_read / 1024:.1f} KiB dalam "
+            f"{self.elapsed:.2f} detik ({self.pages_per_sec:.2f} {self.unit}/detik, "
+            f"{self.bytes_per_sec / 1024:.1f} KiB/detik), {self.cache_hits} dari "
+            f"cache, {self.retries} percobaan ulang, konkurensi akhir "
+            f"{self.concurrency:.1f}"
+        )
+
+
+class IncompleteCrawlError(Exception):
+    def __init__(self, failed: dict[int, BaseException]) -> None:
+        self.failed: dict[int, BaseException] = failed
+        super().__init__(f"Gagal mengambil halaman {sorted(failed)}")
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        target_latency: float,
+    ) -> None:
+        self.limit: float = initial
+        self.minimum: float = minimum
+        self.maximum: float = maximum
+        self.target_latency: float = target_latency
+        self.in_flight: int = 0
+        self.decreased_at: float = float("-inf")
+        self.condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(
+                predicate=lambda: self.in_flight < int(self.limit),
+            )
+            self.in_flight += 1
+
+    async def release(self, latency: float, *, ok: bool) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+
+            now: float = time.perf_counter()
+
+            if ok and latency <= self.target_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif now - latency >= self.decreased_at:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.decreased_at = now
+
+            self.condition.notify_all()
+
+
+class BoundedLimiter:
+    def __init__(self, concurrency: int) -> None:
+        self.limit: float = concurrency
+        self.semaphore = asyncio.BoundedSemaphore(value=concurrency)
+
+    async def acquire(self) -> None:
+        await self.semaphore.acquire()
+
+    async def release(self, latency: float, *, ok: bool) -> None:  # noqa: ARG002
+        self.semaphore.release()
+
+
+def is_retryable(error: BaseException) -> bool:
+    return not (
+        isinstance(error, httpx.HTTPStatusError)
+        and error.response.is_client_error
+        and error.response.status_code not in RETRYABLE_STATUS
+    )
+
+
+class ReqBeClient:
+    def __init__(
+        self,
+        limiter: AdaptiveLimiter | BoundedLimiter,
+        max_connections: int,
+        max_retries: int = 5,
+        retry_budget: int | None = None,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        config: dict[str, typing.Any] | None = None,
+        stats: CrawlStats | None = None,
+        cache: ResponseCache | None = None,
+    ) -> None:
+        self.limiter: AdaptiveLimiter | BoundedLimiter = limiter
+        self.max_retries: int = max_retries
+        self.retry_budget: int | None = retry_budget
+        self.backoff_base: float = backoff_base
+        self.backoff_cap: float = backoff_cap
+        self.config: dict[str, typing.Any] = config or load_config()
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=60,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.stats: CrawlStats = stats or CrawlStats()
+        self.cache: ResponseCache | None = cache
+
+    async def __aenter__(self) -> typing.Self:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.client.aclose()
+
+        if self.cache:
+            self.cache.close()
+
+    def can_retry(self, attempt: int) -> bool:
+        if attempt >= self.max_retries or self.retry_budget == 0:
+            return False
+
+        if self.retry_budget is not None:
+            self.retry_budget -= 1
+
+        return True
+
+    async def post(
+        self,
+        url: str,
+        data: dict[str, typing.Any],
+        extract: Callable[[typing.Any], typing.Any] = lambda body: body,
+    ) -> typing.Any:
+        entry: CacheEntry | None = (
+            self.cache.lookup(endpoint=url, params=data) if self.cache else None
+        )
+
+        if entry is not None and self.cache.is_fresh(entry=entry):
+            self.stats.cache_hits += 1
+
+            return extract(self.cache.load(entry=entry))
+
+        attempt: int = 0
+
+        while True:
+            await self.limiter.acquire()
+            start: float = time.perf_counter()
+
+            try:
+                response: httpx.Response = await self.client.post(
+                    url=f"{self.config['url']['base']}/api/req-be",
+                    json={"method": "post", "url": url, "data": data},
+                    headers=ResponseCache.conditional_headers(entry=entry),
+                )
+
+                if response.status_code == httpx.codes.NOT_MODIFIED and entry:
+                    self.cache.touch(entry=entry)
+                    body: typing.Any = extract(self.cache.load(entry=entry))
+                    self.stats.cache_hits += 1
+                else:
+                    response.raise_for_status()
+                    body: typing.Any = extract(response.json())
+
+                    if self.cache:
+                        self.cache.store(
+                            endpoint=url,
+                            params=data,
+                            content=response.content,
+                            headers=response.headers,
+                        )
+            except (httpx.HTTPError, ValueError, LookupError) as e:
+                retryable: bool = is_retryable(error=e)
+                await self.limiter.release(
+                    latency=time.perf_counter() - start,
+                    ok=not retryable,
+                )
+                self.stats.errors += 1
+
+                if not retryable or not self.can_retry(attempt=attempt):
+                    raise
+
+                self.stats.retries += 1
+                await asyncio.sleep(
+                    delay=random.uniform(
+                        a=0,
+                        b=min(self.backoff_cap, self.backoff_base * 2**attempt),
+                    ),
+                )
+                attempt += 1
+            else:
+                await self.limiter.release(
+                    latency=time.perf_counter() - start,
+                    ok=True,
+                )
+                self.stats.pages += 1
+                self.stats.bytes_read += len(response.content)
+
+                return body
+
+
+class ListingCrawler(ReqBeClient):
+    def __init__(
+        self,
+        limit: int,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        target_latency: float = 10.0,
+        **kwargs: typing.Any,
+    ) -> None:
+        super().__init__(
+            limiter=AdaptiveLimiter(
+                initial=initial_concurrency,
+                minimum=min_concurrency,
+                maximum=max_concurrency,
+                target_latency=target_latency,
+            ),
+            max_connections=max_concurrency,
+            stats=CrawlStats(concurrency=initial_concurrency),
+            **kwargs,
+        )
+        self.limit: int = limit
+
+    async def fetch_page(self, page: int) -> dict[str, typing.Any]:
+        return await self.post(
+            url=self.config["url"]["index"],
+            data={
+                "sorted_by": "tanggal_efektif[desc]",
+                "pagination": {"page": page, "limit": self.limit},
+            },
+        )
+
+    async def crawl(self) -> list[dict[str, typing.Any]]:
+        start: float = time.perf_counter()
+
+        first: dict[str, typing.Any] = await self.fetch_page(page=1)
+
+        data: list[dict[str, typing.Any]] = first["data"]["search_data"]
+
+        pages: list[int] = list(range(2, first["pagination"]["total_page"] + 1))
+
+        results: list[dict[str, typing.Any] | BaseException] = await asyncio.gather(
+            *(self.fetch_page(page=page) for page in pages),
+            return_exceptions=True,
+        )
+
+        self.stats.elapsed = time.perf_counter() - start
+        self.stats.concurrency = self.limiter.limit
+
+        if failed := {
+            page: result
+            for page, result in zip(pages, results, strict=True)
+            if isinstance(result, BaseException)
+        }:
+            raise IncompleteCrawlError(failed=failed)
+
+        for result in results:
+            data.extend(result["data"]["search_data"])
+
+        return data
+
+    async def crawl_incremental(
+        self,
+        watermark: Watermark,
+    ) -> list[dict[str, typing.Any]]:
+        start: float = time.perf_counter()
+
+        data: list[dict[str, typing.Any]] = []
+
+        page: int = 1
+
+        while True:
+            body: dict[str, typing.Any] = await self.fetch_page(page=page)
+
+            data.extend(items := body["data"]["search_data"])
+
+            if page >= body["pagination"]["total_page"] or all(
+                watermark.is_known(item=item) for item in items
+            ):
+                break
+
+            page += 1
+
+        self.stats.elapsed = time.perf_counter() - start
+        self.stats.concurrency = self.limiter.limit
+
+        return data
+
+
+class DetailFetcher(ReqBeClient):
+    def __init__(
+        self,
+        concurrency: int = 16,
+        max_retries: int = 5,
+        retry_budget: int = 500,
+        **kwargs: typing.Any,
+    ) -> None:
+        super().__init__(
+            limiter=BoundedLimiter(concurrency=concurrency),
+            max_connections=concurrency,
+            max_retries=max_retries,
+            retry_budget=retry_budget,
+            stats=CrawlStats(unit="dokumen", concurrency=concurrency),
+            **kwargs,
+        )
+
+    async def fetch_detail(self, permalink: str) -> dict[str, typing.Any]:
+        return await self.post(
+            url=self.config["url"]["detail"],
+            data={"permalink": permalink},
+            extract=lambda body: body["data"][0],
+        )
+
+    async def fetch_all(
+        self,
+        permalinks: Iterable[str],
+    ) -> tuple[pl.Series, list[str]]:
+        start: float = time.perf_counter()
+
+        batch: list[str] = list(permalinks)
+
+        results: list[dict[str, typing.Any] | BaseException] = await asyncio.gather(
+            *(self.fetch_detail(permalink=permalink) for permalink in batch),
+            return_exceptions=True,
+        )
+
+        self.stats.elapsed = time.perf_counter() - start
+
+        return (
+            pl.Series(
+                name="detail",
+                values=[
+                    None if isinstance(result, BaseException) else result
+                    for result in results
+                ],
+                dtype=DETAIL_DTYPE,
+            ),
+            [
+                permalink
+                for permalink, result in zip(batch, results, strict=True)
+                if isinstance(result, BaseException)
+            ],
+        )
+
+
+async def get_all_list_regs(
+    limit: int,
+    **kwargs: typing.Any,
+) -> list[dict]:
+    async with ListingCrawler(
+        limit=limit,
+        cache=ResponseCache(ttl=datetime.timedelta()),
+        **kwargs,
+    ) as crawler:
+        data: list[dict[str, typing.Any]] = await crawler.crawl()
+
+    print(crawler.stats)  # noqa: T201
+
+    return data
+
+
+async def get_new_list_regs(
+    limit: int,
+    watermark: Watermark,
+    **kwargs: typing.Any,
+) -> list[dict]:
+    async with ListingCrawler(
+        limit=limit,
+        cache=ResponseCache(ttl=datetime.timedelta()),
+        **kwargs,
+    ) as crawler:
+        data: list[dict[str, typing.Any]] = await crawler.crawl_incremental(
+            watermark=watermark,
+        )
+
+    print(crawler.stats)  # noqa: T201
+
+    return data
+
+
+def get_detail_regs(
+    permalinks: Iterable[str],
+    cache_ttl: datetime.timedelta | None = DETAIL_TTL,
+    **kwargs: typing.Any,
+) -> tuple[pl.Series, list[str]]:
+    async def run() -> tuple[pl.Series, list[str]]:
+        async with DetailFetcher(
+            cache=ResponseCache(ttl=cache_ttl),
+            **kwargs,
+        ) as fetcher:
+            result: tuple[pl.Series, list[str]] = await fetcher.fetch_all(
+                permalinks=permalinks,
+            )
+
+        print(fetcher.stats)  # noqa: T201
+
+        return result
+
+    detail, failed = asyncio.run(main=run())
+
+    if failed:
+        print(f"{len(failed)} detail gagal diambil: {' '.join(failed)}")  # noqa: T201
+
+    return detail, failed
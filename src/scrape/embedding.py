@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import itertools
+import sqlite3
+import time
+import typing
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
+
+import chromadb
+import numpy as np
+import pydantic
+from chromadb.utils import embedding_functions
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+MULTILINGUAL_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+MODELS: dict[str, str] = {"default": DEFAULT_MODEL, "multilingual": MULTILINGUAL_MODEL}
+
+METADATA_KEY = "embedding_model"
+
+
+class EmbeddingStats(pydantic.BaseModel):
+    texts: int = 0
+    cache_hits: int = 0
+    embedded: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.texts} teks, {self.cache_hits} dari cache, {self.embedded} "
+            f"di-embed dalam {self.elapsed:.2f} detik"
+        )
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path = Path("var/00_cache/embedding.sqlite3")) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(database=path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding (
+                model TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, sha256)
+            )
+            """,
+        )
+
+    @staticmethod
+    def sha256(text: str) -> str:
+        return hashlib.sha256(string=text.encode()).hexdigest()
+
+    def get_many(self, model: str, keys: Iterable[str]) -> dict[str, np.ndarray]:
+        vectors: dict[str, np.ndarray] = {}
+
+        for batch in itertools.batched(keys, n=500, strict=False):
+            vectors.update(
+                (key, np.frombuffer(buffer=vector, dtype=np.float32))
+                for key, vector in self.connection.execute(
+                    "SELECT sha256, vector FROM embedding WHERE model = ? AND sha256 "
+                    f"IN ({', '.join('?' * len(batch))})",
+                    (model, *batch),
+                )
+            )
+
+        return vectors
+
+    def put_many(self, model: str, vectors: dict[str, np.ndarray]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embedding VALUES (?, ?, ?)",
+                (
+                    (model, key, np.asarray(a=vector, dtype=np.float32).tobytes())
+                    for key, vector in vectors.items()
+                ),
+            )
+
+    def evict(self, model: str) -> int:
+        with self.connection:
+            return self.connection.execute(
+                "DELETE FROM embedding WHERE model = ?",
+                (model,),
+            ).rowcount
+
+    def summary(self) -> list[tuple[str, int]]:
+        return self.connection.execute(
+            "SELECT model, COUNT(*) FROM embedding GROUP BY model ORDER BY model",
+        ).fetchall()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def load_model(
+    model: str,
+    threads: int | None = None,
+) -> Callable[[list[str]], Sequence[typing.Any]]:
+    if model == DEFAULT_MODEL:
+        return embedding_functions.ONNXMiniLM_L6_V2()
+
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=model,
+        normalize_embeddings=True,
+    )
+
+
+class Embedder:
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        batch_size: int = 64,
+        threads: int | None = None,
+        cache: EmbeddingCache | None = None,
+    ) -> None:
+        self.model: str = model
+        self.batch_size: int = batch_size
+        self.threads: int | None = threads
+        self.cache: EmbeddingCache | None = cache
+        self.stats = EmbeddingStats()
+        self.function: Callable[[list[str]], Sequence[typing.Any]] | None = None
+
+    @classmethod
+    def for_collection(
+        cls,
+        collection: chromadb.Collection,
+        **kwargs: typing.Any,
+    ) -> "Embedder":
+        return cls(
+            model=(collection.metadata or {}).get(METADATA_KEY, DEFAULT_MODEL),
+            **kwargs,
+        )
+
+    def encode(self, texts: list[str]) -> list[np.ndarray]:
+        if self.function is None:
+            self.function = load_model(model=self.model, threads=self.threads)
+
+        vectors: list[np.ndarray] = []
+
+        for batch in itertools.batched(texts, n=self.batch_size, strict=False):
+            vectors += [
+                np.asarray(a=vector, dtype=np.float32)
+                for vector in self.function(list(batch))
+            ]
+
+        return vectors
+
+    def __call__(self, texts: Sequence[str]) -> list[np.ndarray]:
+        start: float = time.perf_counter()
+        keys: list[str] = [EmbeddingCache.sha256(text=text) for text in texts]
+        vectors: dict[str, np.ndarray] = (
+            self.cache.get_many(model=self.model, keys=set(keys)) if self.cache else {}
+        )
+        missing: dict[str, str] = {
+            key: text
+            for key, text in zip(keys, texts, strict=True)
+            if key not in vectors
+        }
+
+        self.stats.cache_hits += sum(key in vectors for key in keys)
+
+        if missing:
+            embedded: dict[str, np.ndarray] = dict(
+                zip(missing, self.encode(texts=list(missing.values())), strict=True),
+            )
+            vectors.update(embedded)
+
+            if self.cache:
+                self.cache.put_many(model=self.model, vectors=embedded)
+
+        self.stats.texts += len(texts)
+        self.stats.embedded += len(missing)
+        self.stats.elapsed += time.perf_counter() - start
+
+        return [vectors[key] for key in keys]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kelola cache embedding.")
+    parser.add_argument("command", choices=["stats", "evict"])
+    parser.add_argument(
+        "--path",
+        type=Path,
+        default=Path("var/00_cache/embedding.sqlite3"),
+    )
+    parser.add_argument("--model", help="Hapus entri untuk model ini.")
+    args: argparse.Namespace = parser.parse_args()
+
+    cache = EmbeddingCache(path=args.path)
+
+    if args.command == "evict" and args.model:
+        print(f"{cache.evict(model=args.model)} entri dihapus.")  # noqa: T201
+
+    for model, entries in cache.summary():
+        print(f"{model}: {entries} entri")  # noqa: T201
+
+    cache.close()
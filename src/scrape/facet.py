@@ -0,0 +1,59 @@
+import json
+import typing
+from pathlib import Path
+
+import polars as pl
+
+FACET_FIELDS = ["status_dokumen", "jenis_peraturan", "topik"]
+
+
+def counts(frame: pl.LazyFrame, field: str) -> list[dict[str, typing.Any]]:
+    if field == "topik":
+        frame: pl.LazyFrame = frame.with_columns(
+            pl.col(name="topik").str.split(by=" "),
+        ).explode(columns="topik")
+
+    return (
+        frame.filter(pl.col(name=field).is_not_null())
+        .group_by(field)
+        .agg(pl.len().alias(name="count"))
+        .sort(by=["count", field], descending=[True, False])
+        .rename(mapping={field: "value"})
+        .collect()
+        .to_dicts()
+    )
+
+
+def build(frame: pl.LazyFrame) -> dict[str, typing.Any]:
+    dates: dict[str, typing.Any] = (
+        frame.select(
+            pl.col(name="tanggal_efektif").min().alias(name="min"),
+            pl.col(name="tanggal_efektif").max().alias(name="max"),
+        )
+        .collect()
+        .row(index=0, named=True)
+    )
+
+    return {
+        "regulations": frame.select(pl.len()).collect().item(),
+        "tanggal_efektif": {
+            name: value.isoformat() if value else None for name, value in dates.items()
+        },
+        **{field: counts(frame=frame, field=field) for field in FACET_FIELDS},
+    }
+
+
+def write(frame: pl.LazyFrame, path: Path) -> dict[str, typing.Any]:
+    tmp: Path = path.with_suffix(suffix=".tmp")
+    tmp.write_text(data=json.dumps(obj=(index := build(frame=frame)), indent=2))
+    tmp.replace(target=path)
+
+    return index
+
+
+def load(path: Path) -> dict[str, typing.Any]:
+    return json.loads(s=path.read_text())
+
+
+def values(index: dict[str, typing.Any], field: str) -> list[str]:
+    return sorted(item["value"] for item in index[field])
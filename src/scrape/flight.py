@@ -0,0 +1,141 @@
+import hashlib
+import json
+import threading
+import typing
+from collections.abc import Callable, Iterable, Iterator
+
+import pydantic
+
+TIMEOUT = 120.0
+
+
+class FlightStats(pydantic.BaseModel):
+    leaders: int = 0
+    followers: int = 0
+    in_flight: int = 0
+    shared_chunks: int = 0
+    errors: int = 0
+
+    @property
+    def coalesce_rate(self) -> float:
+        requests: int = self.leaders + self.followers
+
+        return self.followers / requests if requests else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Permintaan LLM: {self.leaders} ke model, {self.followers} digabung "
+            f"({self.coalesce_rate:.0%}), {self.in_flight} berjalan, "
+            f"{self.shared_chunks} potongan dibagikan, {self.errors} gagal."
+        )
+
+
+def normalise(value: typing.Any) -> typing.Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+
+    if isinstance(value, list | tuple):
+        return [normalise(value=item) for item in value]
+
+    return value
+
+
+def key(*parts: typing.Any) -> str:
+    return hashlib.sha256(
+        string=json.dumps(obj=normalise(value=parts), default=str).encode(),
+    ).hexdigest()
+
+
+class Flight:
+    def __init__(self) -> None:
+        self.chunks: list[typing.Any] = []
+        self.done: bool = False
+        self.error: BaseException | None = None
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = TIMEOUT) -> None:
+        self.timeout: float = timeout
+        self.flights: dict[str, Flight] = {}
+        self.lock = threading.Lock()
+        self.stats = FlightStats()
+
+    def finish(self, key: str, flight: Flight, error: BaseException | None) -> None:
+        with self.lock:
+            self.flights.pop(key, None)
+            self.stats.in_flight -= 1
+            self.stats.errors += error is not None
+
+        with flight.condition:
+            flight.error = error
+            flight.done = True
+            flight.condition.notify_all()
+
+    def run(self, key: str, flight: Flight, chunks: Iterable[typing.Any]) -> None:
+        try:
+            for chunk in chunks:
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except Exception as e:
+            self.finish(key=key, flight=flight, error=e)
+        else:
+            self.finish(key=key, flight=flight, error=None)
+
+    def stream(
+        self,
+        key: str,
+        generate: Callable[[], Iterable[typing.Any]],
+    ) -> Iterator[typing.Any]:
+        with self.lock:
+            flight: Flight | None = self.flights.get(key)
+            leader: bool = flight is None
+
+            if leader:
+                flight = self.flights[key] = Flight()
+                self.stats.leaders += 1
+                self.stats.in_flight += 1
+            else:
+                self.stats.followers += 1
+
+        if leader:
+            try:
+                chunks: Iterable[typing.Any] = generate()
+            except BaseException as e:
+                self.finish(key=key, flight=flight, error=e)
+                raise
+
+            threading.Thread(
+                target=self.run,
+                kwargs={"key": key, "flight": flight, "chunks": chunks},
+                daemon=True,
+            ).start()
+
+        index: int = 0
+
+        while True:
+            with flight.condition:
+                if not flight.condition.wait_for(
+                    predicate=lambda index=index: (
+                        len(flight.chunks) > index or flight.done
+                    ),
+                    timeout=self.timeout,
+                ):
+                    raise TimeoutError(key)
+
+                chunks: list[typing.Any] = flight.chunks[index:]
+                done: bool = flight.done
+
+            if not leader:
+                with self.lock:
+                    self.stats.shared_chunks += len(chunks)
+
+            index += len(chunks)
+            yield from chunks
+
+            if done:
+                if flight.error is not None:
+                    raise flight.error
+
+                return
@@ -1,25 +1,46 @@
+import argparse
 import asyncio
-import time
 from pathlib import Path
 
 import chromadb
+import clean
+import crawler
+import embedding
+import facet
+import journal
+import lexical
+import pipeline
 import polars as pl
-import utils
+import qa
+import store
+import sync
 
 path_raw = Path("var/01_raw")
 path_clean = Path("var/02_clean")
 path_final = Path("var/03_final")
 
-for path in [path_raw, path_clean, path_final]:
-    path.mkdir(parents=True, exist_ok=True)
+path_01 = path_raw / "index.parquet"
+path_02 = path_raw / "detail.parquet"
+path_03 = path_clean / "processed.parquet"
+path_04 = path_final / "topic.parquet"
+path_05 = path_final / "regulation.parquet"
+path_06 = path_final / "embed.parquet"
+path_07 = Path(".chroma/chroma.sqlite3")
+path_facet = path_final / "facet.json"
+path_08 = path_final / "lexical_docs.parquet"
+path_repair = path_final / "repair.parquet"
 
-start: float = time.time()
-accumulate_time: float = 0.0
+JOURNAL_BATCH = 200
 
-if not (path_01 := path_raw / "index.json").exists():
+EXPORT_CSV = False
+
+EMBEDDING_MODEL = embedding.DEFAULT_MODEL
+
+
+def index() -> int:
     (
-        pl.DataFrame(
-            data=asyncio.run(main=utils.get_all_list_regs(limit=4000)),
+        df := pl.DataFrame(
+            data=asyncio.run(main=crawler.get_all_list_regs(limit=4000)),
         )
         .unique(subset="permalink")
         .with_columns(
@@ -30,154 +51,143 @@ if not (path_01 := path_raw / "index.json").exists():
             .alias("flattened_topik"),
         )
         .filter(pl.col(name="flattened_topik").str.contains(pattern=r"2|3"))
-        .write_json(file=path_01)
+    ).pipe(function=store.write, path=path_01, export=EXPORT_CSV)
+
+    return df.height
+
+
+def detail() -> int:
+    df_index: pl.DataFrame = pl.read_parquet(source=path_01)
+    detail_journal = journal.Journal(
+        path=path_raw / "detail.parts",
+        schema=pl.Schema(schema={**df_index.schema, "detail": crawler.DETAIL_DTYPE}),
     )
-path_01_time: float = time.time() - start - accumulate_time
-accumulate_time += path_01_time
-print(path_01, f"created in {path_01_time:.2f} seconds.")  # noqa: T201
 
-if not (path_02 := path_raw / "detail.json").exists():
-    (
-        pl.read_json(source=path_01)
-        .with_columns(
-            pl.col(name="permalink")
-            .map_elements(function=utils.get_detail_reg, return_dtype=pl.Struct)
-            .alias(name="detail"),
+    failed: list[str] = []
+
+    for batch in detail_journal.remaining(df=df_index).iter_slices(
+        n_rows=JOURNAL_BATCH,
+    ):
+        details, batch_failed = crawler.get_detail_regs(permalinks=batch["permalink"])
+        failed += batch_failed
+        part: Path = detail_journal.append(
+            df=batch.with_columns(details).filter(
+                pl.col(name="detail").is_not_null(),
+            ),
         )
+        print(part, f"{batch.height} rows journaled.")  # noqa: T201
+
+    (
+        df := detail_journal.read()
         .with_columns(pl.col(name="flattened_topik").alias("topik"))
         .drop("flattened_topik")
-        .write_json(file=path_02)
-    )
-path_02_time: float = time.time() - start - accumulate_time
-accumulate_time += path_02_time
-print(path_02, f"created in {path_02_time:.2f} seconds.")  # noqa: T201
+    ).pipe(function=store.write, path=path_02, export=EXPORT_CSV)
 
-if not (path_03 := path_clean / "processed.csv").exists():
-    (
-        pl.read_json(source=path_02, infer_schema_length=284)
-        .select(
-            [
-                pl.col(name="permalink"),
-                pl.col(name="perihal"),
-                pl.col(name="tanggal_efektif").str.to_date(format="%d-%m-%Y"),
-                pl.col(name="status_dokumen"),
-                pl.col(name="topik"),
-                pl.col(name="detail").struct.field(
-                    name=[
-                        "jenis_peraturan",
-                        "nomor_peraturan",
-                        "body_final",
-                        "peraturan_terbaru",
-                        "peraturan_sebelumnya",
-                        "peraturan_relevan",
-                    ],
-                ),
-                pl.col(name="detail")
-                .struct.field(name="meta")
-                .struct.field(name="keywords"),
-            ],
+    if failed:
+        print(  # noqa: T201
+            f"{len(failed)} detail gagal diambil dan tetap di jurnal "
+            f"{detail_journal.path}; ulangi dengan --force detail.",
         )
-        .with_columns(
-            [
-                pl.col(name="body_final")
-                .str.replace_all(pattern=r"\r+|\n+|\t+", value="")
-                .str.replace_all(pattern=r"\"", value="'"),
-                pl.col(name="peraturan_terbaru")
-                .list.eval(expr=pl.element().struct.field(name="permalink"))
-                .list.sort()
-                .list.join(separator=" "),
-                pl.col(name="peraturan_sebelumnya")
-                .list.eval(expr=pl.element().struct.field(name="permalink"))
-                .list.sort()
-                .list.join(separator=" "),
-                pl.col(name="peraturan_relevan")
-                .list.eval(expr=pl.element().struct.field(name="permalink"))
-                .list.sort()
-                .list.join(separator=" "),
-            ],
-        )
-        .write_csv(file=path_03)
-    )
-path_03_time: float = time.time() - start - accumulate_time
-accumulate_time += path_03_time
-print(path_03, f"created in {path_03_time:.2f} seconds.")  # noqa: T201
+    else:
+        detail_journal.clear()
+
+    return df.height
+
 
-if not (path_04 := path_final / "topic.csv").exists():
+def processed() -> int:
     (
-        pl.read_json(source=path_01)
+        df := pl.scan_parquet(source=path_02)
+        .with_columns(pl.col(name="tanggal_efektif").str.to_date(format="%d-%m-%Y"))
+        .pipe(function=sync.processed)
+        .collect()
+    ).pipe(function=store.write, path=path_03, export=EXPORT_CSV)
+
+    return df.height
+
+
+def topic() -> int:
+    (
+        df := pl.scan_parquet(source=path_01)
         .select(["topik"])
         .explode(columns="topik")
         .unnest(columns="topik")
         .unique()
         .sort(by="uuid")
-        .write_csv(file=path_04)
+        .collect()
+    ).pipe(function=store.write, path=path_04, export=EXPORT_CSV)
+
+    return df.height
+
+
+def regulation() -> int:
+    store.write(
+        df=(df := pl.read_parquet(source=path_03)),
+        path=path_05,
+        export=EXPORT_CSV,
+    )
+    facet.write(frame=df.lazy(), path=path_facet)
+
+    return df.height
+
+
+def embed() -> int:
+    df_body: pl.DataFrame = pl.read_parquet(
+        source=path_03,
+        columns=["permalink", "body_final"],
+    )
+    qa_journal = journal.Journal(
+        path=path_clean / "embed.parts",
+        schema=pl.Schema(schema={"permalink": pl.Utf8, "body_final": qa.QA_DTYPE}),
     )
-path_04_time: float = time.time() - start - accumulate_time
-accumulate_time += path_04_time
-print(path_04, f"created in {path_04_time:.2f} seconds.")  # noqa: T201
 
-if not (path_05 := path_final / "regulation.csv").exists():
-    (pl.read_csv(source=path_03).write_csv(file=path_05))
-path_05_time: float = time.time() - start - accumulate_time
-accumulate_time += path_05_time
-print(path_05, f"created in {path_05_time:.2f} seconds.")  # noqa: T201
+    with clean.pool() as executor:
+        for batch in qa_journal.remaining(df=df_body).iter_slices(
+            n_rows=JOURNAL_BATCH,
+        ):
+            part: Path = qa_journal.append(
+                df=batch.pipe(function=clean.with_clean_text, executor=executor)
+                .pipe(function=qa.with_qa_lists)
+                .filter(pl.col(name="body_final").is_not_null()),
+            )
+            print(part, f"{batch.height} rows journaled.")  # noqa: T201
 
-if not (path_06 := path_final / "embed.csv").exists():
     (
-        pl.read_csv(source=path_03)
-        .select(["permalink", "body_final"])
-        .with_columns(
-            pl.col(name="body_final")
-            .map_elements(function=utils.strip_html_tags, return_dtype=pl.Utf8)
-            .str.strip_chars()
-            .str.replace_all(pattern=r"\s+", value=" "),
-        )
-        .with_columns(
-            pl.col(name="body_final").map_elements(
-                function=utils.generate_qa_list,
-                return_dtype=pl.List(
-                    inner=pl.Struct(
-                        fields=[
-                            pl.Field(name="question", dtype=pl.Utf8),
-                            pl.Field(name="answer", dtype=pl.Utf8),
-                        ],
-                    ),
-                ),
-            ),
-        )
+        df := df_body.select("permalink")
+        .join(other=qa_journal.read(), on="permalink", how="left")
+        .with_columns(pl.col(name="body_final").fill_null(value=qa.FAILED_QA_LIST))
         .explode(columns="body_final")
         .unnest(columns="body_final")
         .with_columns(
             pl.col(name="permalink")
             .cum_count()
             .over(partition_by="permalink")
-            .cast(dtype=pl.Utf8)
             .alias(name="id"),
         )
-        .select(
-            [
-                pl.col(name="id"),
-                pl.col(name="permalink"),
-                pl.col(name="question"),
-                pl.col(name="answer"),
-            ],
-        )
-        .write_csv(file=path_06)
-    )
-path_06_time: float = time.time() - start - accumulate_time
-accumulate_time += path_06_time
-print(path_06, f"created in {path_06_time:.2f} seconds.")  # noqa: T201
+    ).pipe(function=store.write, path=path_06, export=EXPORT_CSV)
+    qa_journal.clear()
+
+    return df.height
+
 
-if not (path_07 := Path(".chroma/chroma.sqlite3")).exists():
+def chroma() -> int:
     chroma_client: chromadb.ClientAPI = chromadb.PersistentClient(
         path=".chroma",
         settings=chromadb.config.Settings(anonymized_telemetry=False),
     )
-    collection: chromadb.Collection = chroma_client.create_collection(name="tax-rag")
+    chroma_client.get_or_create_collection(name="tax-rag")
+    chroma_client.delete_collection(name="tax-rag")
+    collection: chromadb.Collection = chroma_client.create_collection(
+        name="tax-rag",
+        metadata={embedding.METADATA_KEY: EMBEDDING_MODEL},
+    )
+    embedder = embedding.Embedder(
+        model=EMBEDDING_MODEL,
+        cache=embedding.EmbeddingCache(),
+    )
 
     data: pl.DataFrame = (
-        pl.read_csv(source=path_06)
-        .join(other=pl.read_csv(source=path_03), on="permalink")
+        pl.scan_parquet(source=path_06)
+        .join(other=pl.scan_parquet(source=path_03), on="permalink")
         .select(
             [
                 pl.concat_str(
@@ -192,11 +202,13 @@ if not (path_07 := Path(".chroma/chroma.sqlite3")).exists():
                         pl.col(name="topik"),
                         pl.col(name="jenis_peraturan"),
                         pl.col(name="nomor_peraturan"),
+                        pl.col(name="chunk").fill_null(value=""),
                     ],
                 ).alias(name="metadata"),
                 pl.col(name="question").alias(name="document"),
             ],
         )
+        .collect()
     )
 
     max_batch: int = chroma_client.get_max_batch_size()
@@ -206,66 +218,159 @@ if not (path_07 := Path(".chroma/chroma.sqlite3")).exists():
         collection.add(
             ids=batch["id"].to_list(),
             metadatas=batch["metadata"].to_list(),
-            documents=batch["document"].to_list(),
+            documents=(documents := batch["document"].to_list()),
+            embeddings=embedder(texts=documents),
         )
-path_07_time: float = time.time() - start - accumulate_time
-accumulate_time += path_07_time
-print(path_07, f"created in {path_07_time:.2f} seconds.")  # noqa: T201
 
-if (
-    df_must_remove := (df_embed := pl.read_csv(source="var/03_final/embed.csv")).filter(
+    print(embedder.stats)  # noqa: T201
+    embedder.cache.close()
+
+    return collection.count()
+
+
+def lexical_index() -> int:
+    rows: int = lexical.write(
+        collection=chromadb.PersistentClient(
+            path=".chroma",
+            settings=chromadb.config.Settings(anonymized_telemetry=False),
+        ).get_collection(name="tax-rag"),
+        regulation=pl.read_parquet(source=path_05),
+        path=path_final,
+    )
+    store.bump_generation(path=path_final)
+
+    return rows
+
+
+def repair() -> int:
+    df_embed: pl.DataFrame = pl.read_parquet(source=path_06)
+    df_must_remove: pl.DataFrame = df_embed.filter(
         pl.col(name="question") == "Failed to generate.",
     )
-).height:
-    pl.concat(
-        items=[
-            df_embed.filter(pl.col(name="question") != "Failed to generate."),
-            df_must_remove.join(
-                other=pl.read_csv(source="var/03_final/regulation.csv"),
-                on="permalink",
-                how="inner",
-            )
-            .select(["permalink", "body_final"])
-            .with_columns(
-                pl.col(name="body_final")
-                .map_elements(function=utils.strip_html_tags, return_dtype=pl.Utf8)
-                .str.strip_chars()
-                .str.replace_all(pattern=r"\s+", value=" "),
-            )
-            .with_columns(
-                pl.col(name="body_final").map_elements(
-                    function=utils.generate_qa_list,
-                    return_dtype=pl.List(
-                        inner=pl.Struct(
-                            fields=[
-                                pl.Field(name="question", dtype=pl.Utf8),
-                                pl.Field(name="answer", dtype=pl.Utf8),
-                            ],
-                        ),
+
+    if df_must_remove.height:
+        pl.concat(
+            items=[
+                df_embed.filter(pl.col(name="question") != "Failed to generate."),
+                df_must_remove.join(
+                    other=pl.read_parquet(
+                        source=path_05,
+                        columns=["permalink", "body_final"],
                     ),
-                ),
-            )
-            .explode(columns="body_final")
-            .unnest(columns="body_final")
-            .with_columns(
-                pl.col(name="permalink")
-                .cum_count()
-                .over(partition_by="permalink")
-                .cast(dtype=pl.Utf8)
-                .alias(name="id"),
-            )
-            .select(
-                [
-                    pl.col(name="id").cast(dtype=pl.Int64),
-                    pl.col(name="permalink"),
-                    pl.col(name="question"),
-                    pl.col(name="answer"),
-                ],
-            ),
-        ],
-    ).write_csv(file=path_06)
-    failed_question_update_time: float = time.time() - start - accumulate_time
-    accumulate_time += failed_question_update_time
-    print(path_06, f"updated in {failed_question_update_time:.2f} seconds.")  # noqa: T201
+                    on="permalink",
+                    how="inner",
+                )
+                .select(["permalink", "body_final"])
+                .pipe(function=clean.with_clean_text)
+                .pipe(function=qa.with_qa_lists)
+                .with_columns(
+                    pl.col(name="body_final").fill_null(value=qa.FAILED_QA_LIST),
+                )
+                .explode(columns="body_final")
+                .unnest(columns="body_final")
+                .with_columns(
+                    pl.col(name="permalink")
+                    .cum_count()
+                    .over(partition_by="permalink")
+                    .cast(dtype=pl.Int64)
+                    .alias(name="id"),
+                )
+                .select(store.EMBED_SCHEMA.names()),
+            ],
+        ).pipe(function=store.write, path=path_06, export=EXPORT_CSV)
+
+    df_must_remove.select("permalink").pipe(
+        function=store.write,
+        path=path_repair,
+        export=EXPORT_CSV,
+    )
+
+    return df_must_remove.height
+
 
-print(f"\nTotal time: {accumulate_time:.2f} seconds.")  # noqa: T201
+PIPELINE = pipeline.Pipeline(
+    stages=[
+        pipeline.Stage(name="index", output=path_01, run=index),
+        pipeline.Stage(name="detail", output=path_02, run=detail, depends=["index"]),
+        pipeline.Stage(
+            name="processed",
+            output=path_03,
+            run=processed,
+            depends=["detail"],
+        ),
+        pipeline.Stage(name="topic", output=path_04, run=topic, depends=["index"]),
+        pipeline.Stage(
+            name="regulation",
+            output=path_05,
+            run=regulation,
+            depends=["processed"],
+        ),
+        pipeline.Stage(name="embed", output=path_06, run=embed, depends=["processed"]),
+        pipeline.Stage(
+            name="repair",
+            output=path_repair,
+            run=repair,
+            depends=["regulation", "embed"],
+        ),
+        pipeline.Stage(
+            name="chroma",
+            output=path_07,
+            run=chroma,
+            depends=["processed", "embed", "repair"],
+        ),
+        pipeline.Stage(
+            name="lexical",
+            output=path_08,
+            run=lexical_index,
+            depends=["regulation", "chroma"],
+        ),
+    ],
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bangun data awal tax-rag.")
+    parser.add_argument(
+        "--stage",
+        nargs="+",
+        choices=PIPELINE.stages,
+        help="Jalankan tahap ini beserta dependensinya yang belum ada.",
+    )
+    parser.add_argument(
+        "--force",
+        nargs="+",
+        default=[],
+        choices=PIPELINE.stages,
+        help="Jalankan ulang tahap ini dan tahap yang bergantung padanya.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Simpan hasil cProfile setiap tahap.",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="Ukur puncak alokasi Python setiap tahap dengan tracemalloc.",
+    )
+    parser.add_argument(
+        "--embedding-model",
+        choices=embedding.MODELS,
+        default="default",
+        help=(
+            "Model embedding untuk koleksi Chroma yang dibangun ulang; "
+            "'multilingual' butuh `uv sync --extra multilingual`."
+        ),
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    EMBEDDING_MODEL = embedding.MODELS[args.embedding_model]
+
+    for path in [path_raw, path_clean, path_final]:
+        path.mkdir(parents=True, exist_ok=True)
+
+    PIPELINE.run(
+        targets=args.stage,
+        force=args.force,
+        profile=args.profile,
+        trace=args.tracemalloc,
+    )
@@ -0,0 +1,322 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import time
+import traceback
+import typing
+from collections.abc import Callable
+from pathlib import Path
+
+import chromadb
+import pydantic
+import sync
+
+ACTIVE = ("queued", "running")
+
+LOCK_TIMEOUT = 1800.0
+
+
+class SyncLockedError(Exception):
+    pass
+
+
+class SyncLock:
+    def __init__(
+        self,
+        path: Path = Path("var/sync.lock"),
+        timeout: float = 0.0,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.path: Path = path
+        self.timeout: float = timeout
+        self.connection: sqlite3.Connection | None = None
+
+    def __enter__(self) -> typing.Self:
+        self.connection = sqlite3.connect(
+            database=self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+        )
+
+        try:
+            self.connection.execute("BEGIN EXCLUSIVE")
+        except sqlite3.OperationalError as e:
+            self.connection.close()
+            self.connection = None
+            raise SyncLockedError(f"Sinkronisasi lain sedang berjalan: {e}") from e
+
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        if self.connection is not None:
+            self.connection.execute("ROLLBACK")
+            self.connection.close()
+            self.connection = None
+
+
+class Job(pydantic.BaseModel):
+    id: int
+    kind: str
+    params: dict[str, typing.Any]
+    status: str
+    created_at: datetime.datetime
+    started_at: datetime.datetime | None
+    finished_at: datetime.datetime | None
+    progress: str | None
+    timings: dict[str, float]
+    result: str | None
+    error: str | None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+
+        return (
+            (self.finished_at or datetime.datetime.now(tz=datetime.UTC))
+            - self.started_at
+        ).total_seconds()
+
+
+class JobQueue:
+    def __init__(self, path: Path = Path("var/jobs.sqlite3")) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(
+            database=path,
+            timeout=30.0,
+            check_same_thread=False,
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                progress TEXT,
+                timings TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT
+            )
+            """,
+        )
+
+    @staticmethod
+    def now() -> str:
+        return datetime.datetime.now(tz=datetime.UTC).isoformat()
+
+    @staticmethod
+    def to_job(row: tuple) -> Job:
+        return Job(
+            id=row[0],
+            kind=row[1],
+            params=json.loads(s=row[2]),
+            status=row[3],
+            created_at=row[4],
+            started_at=row[5],
+            finished_at=row[6],
+            progress=row[7],
+            timings=json.loads(s=row[8]),
+            result=row[9],
+            error=row[10],
+        )
+
+    def enqueue(self, kind: str, params: dict[str, typing.Any] | None = None) -> Job:
+        encoded: str = json.dumps(obj=params or {}, sort_keys=True)
+
+        with self.connection:
+            if (
+                row := self.connection.execute(
+                    "SELECT * FROM job WHERE kind = ? AND params = ? "
+                    "AND status IN (?, ?) ORDER BY id LIMIT 1",
+                    (kind, encoded, *ACTIVE),
+                ).fetchone()
+            ) is None:
+                row = self.connection.execute(
+                    "INSERT INTO job (kind, params, status, created_at) "
+                    "VALUES (?, ?, 'queued', ?) RETURNING *",
+                    (kind, encoded, self.now()),
+                ).fetchone()
+
+        return self.to_job(row=row)
+
+    def get(self, job_id: int) -> Job | None:
+        row: tuple | None = self.connection.execute(
+            "SELECT * FROM job WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+
+        return None if row is None else self.to_job(row=row)
+
+    def latest(self, kind: str) -> Job | None:
+        row: tuple | None = self.connection.execute(
+            "SELECT * FROM job WHERE kind = ? ORDER BY id DESC LIMIT 1",
+            (kind,),
+        ).fetchone()
+
+        return None if row is None else self.to_job(row=row)
+
+    def pending(self) -> bool:
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM job WHERE status = 'queued' LIMIT 1",
+            ).fetchone()
+            is not None
+        )
+
+    def claim(self) -> Job | None:
+        with self.connection:
+            row: tuple | None = self.connection.execute(
+                "UPDATE job SET status = 'running', started_at = ?, progress = ? "
+                "WHERE id = (SELECT id FROM job WHERE status = 'queued' "
+                "ORDER BY id LIMIT 1) RETURNING *",
+                (self.now(), f"Diproses oleh pid {os.getpid()}"),
+            ).fetchone()
+
+        return None if row is None else self.to_job(row=row)
+
+    def report(
+        self,
+        job_id: int,
+        progress: str,
+        timings: dict[str, float] | None = None,
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE job SET progress = ?, timings = COALESCE(?, timings) "
+                "WHERE id = ?",
+                (
+                    progress,
+                    None if timings is None else json.dumps(obj=timings),
+                    job_id,
+                ),
+            )
+
+    def finish(
+        self,
+        job_id: int,
+        result: str,
+        timings: dict[str, float],
+        error: str | None = None,
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE job SET status = ?, finished_at = ?, result = ?, "
+                "timings = ?, error = ? WHERE id = ?",
+                (
+                    "failed" if error else "done",
+                    self.now(),
+                    result,
+                    json.dumps(obj=timings),
+                    error,
+                    job_id,
+                ),
+            )
+
+    def requeue_stale(self) -> int:
+        with self.connection:
+            return self.connection.execute(
+                "UPDATE job SET status = 'queued', started_at = NULL "
+                "WHERE status = 'running'",
+            ).rowcount
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def run_sync(queue: JobQueue, job: Job) -> None:
+    timings: dict[str, float] = {}
+    lines: list[str] = []
+
+    def progress(message: str) -> None:
+        lines.append(message)
+        queue.report(job_id=job.id, progress=message, timings=timings)
+
+    try:
+        chroma_client: chromadb.ClientAPI = chromadb.PersistentClient(
+            path=".chroma",
+            settings=chromadb.config.Settings(anonymized_telemetry=False),
+        )
+        engine = sync.SyncEngine(
+            chroma_client=chroma_client,
+            collection=chroma_client.get_collection(name="tax-rag"),
+            progress=progress,
+        )
+
+        plan: sync.SyncPlan = engine.plan(
+            full=job.params.get("full"),
+            dry_run=bool(job.params.get("dry_run")),
+        )
+        timings["plan"] = plan.elapsed
+        progress(message=str(object=plan))
+
+        if not job.params.get("dry_run"):
+            report: sync.SyncReport = engine.apply(plan=plan)
+            timings.update(report.timings)
+            progress(message=str(object=report))
+    except Exception:
+        queue.finish(
+            job_id=job.id,
+            result="\n".join(lines),
+            timings=timings,
+            error=traceback.format_exc(),
+        )
+    else:
+        queue.finish(job_id=job.id, result="\n".join(lines), timings=timings)
+
+
+HANDLERS: dict[str, Callable[[JobQueue, Job], None]] = {"sync": run_sync}
+
+
+def work(queue: JobQueue, interval: float = 2.0, *, once: bool = False) -> None:
+    with contextlib.suppress(SyncLockedError), SyncLock():
+        if requeued := queue.requeue_stale():
+            print(f"{requeued} job terputus dimasukkan ulang ke antrean.")  # noqa: T201
+
+    while True:
+        if not queue.pending():
+            if once:
+                return
+
+            time.sleep(interval)
+            continue
+
+        try:
+            with SyncLock(timeout=LOCK_TIMEOUT):
+                if (job := queue.claim()) is None:
+                    continue
+
+                print(f"Job #{job.id} ({job.kind}) mulai.")  # noqa: T201
+                HANDLERS[job.kind](queue, job)
+                print(  # noqa: T201
+                    f"Job #{job.id} selesai: {queue.get(job_id=job.id).status}.",
+                )
+        except SyncLockedError as e:
+            print(e)  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pekerja antrean job tax-rag.")
+    parser.add_argument("--path", type=Path, default=Path("var/jobs.sqlite3"))
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Berhenti setelah antrean kosong.",
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    work(queue=JobQueue(path=args.path), interval=args.interval, once=args.once)
@@ -0,0 +1,55 @@
+import shutil
+from pathlib import Path
+
+import polars as pl
+
+
+class Journal:
+    def __init__(
+        self,
+        path: Path,
+        key: str = "permalink",
+        schema: pl.Schema | None = None,
+    ) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+
+        self.path: Path = path
+        self.key: str = key
+        self.schema: pl.Schema | None = schema
+
+    def parts(self) -> list[Path]:
+        return sorted(self.path.glob(pattern="part-*.parquet"))
+
+    def done(self) -> pl.Series:
+        return (
+            pl.scan_parquet(source=parts)
+            .select(self.key)
+            .collect()
+            .get_column(
+                name=self.key,
+            )
+            if (parts := self.parts())
+            else pl.Series(name=self.key, dtype=pl.Utf8)
+        )
+
+    def remaining(self, df: pl.DataFrame) -> pl.DataFrame:
+        return df.join(other=self.done().to_frame(), on=self.key, how="anti")
+
+    def append(self, df: pl.DataFrame) -> Path:
+        part: Path = self.path / f"part-{len(self.parts()):05d}.parquet"
+        tmp: Path = part.with_suffix(suffix=".tmp")
+
+        df.write_parquet(file=tmp)
+        tmp.replace(target=part)
+
+        return part
+
+    def read(self) -> pl.DataFrame:
+        return (
+            pl.read_parquet(source=parts)
+            if (parts := self.parts())
+            else pl.DataFrame(schema=self.schema)
+        )
+
+    def clear(self) -> None:
+        shutil.rmtree(path=self.path, ignore_errors=True)
@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+import pydantic
+from crawler import load_config
+from google import genai
+
+LANES: dict[str, int] = {"chat": 0, "qa": 1}
+
+WAITER_TTL = 120.0
+
+
+class KeyUsage(pydantic.BaseModel):
+    name: str
+    tokens: float
+    capacity: float
+    in_flight: int
+    calls: int
+    successes: int
+    failures: int
+    rate_limited: int
+    latency: float | None
+    cooldown: float
+
+    @property
+    def utilisation(self) -> float:
+        return 1 - self.tokens / self.capacity if self.capacity else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.utilisation:.0%} terpakai "
+            f"({self.tokens:.1f}/{self.capacity:.0f} token), "
+            f"{self.in_flight} berjalan, "
+            f"{self.successes}/{self.calls} berhasil, {self.rate_limited} kali 429, "
+            + (f"latensi {self.latency:.2f} detik" if self.latency else "latensi -")
+            + (f", jeda {self.cooldown:.0f} detik" if self.cooldown else "")
+        )
+
+
+class Lease:
+    def __init__(self, key_id: str, name: str, client: genai.Client) -> None:
+        self.key_id: str = key_id
+        self.name: str = name
+        self.client: genai.Client = client
+
+
+class KeyPool:
+    def __init__(
+        self,
+        api_keys: list[str] | None = None,
+        path: Path = Path("var/00_cache/keypool.sqlite3"),
+        rpm: float = 30,
+        burst: float = 5,
+        reserve: float = 1,
+        cooldown: float = 60.0,
+        poll: float = 0.25,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        api_keys = api_keys or load_config()["api_keys"]
+        self.keys: dict[str, tuple[str, genai.Client]] = {
+            hashlib.sha256(string=api_key.encode()).hexdigest()[:16]: (
+                f"...{api_key[-4:]}",
+                genai.Client(api_key=api_key),
+            )
+            for api_key in api_keys
+        }
+        self.reserve: float = reserve
+        self.cooldown: float = cooldown
+        self.poll: float = poll
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            database=path,
+            timeout=30.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS key (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                rate REAL NOT NULL,
+                capacity REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                cooldown_until REAL NOT NULL DEFAULT 0,
+                in_flight INTEGER NOT NULL DEFAULT 0,
+                calls INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                rate_limited INTEGER NOT NULL DEFAULT 0,
+                latency REAL
+            )
+            """,
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS waiter (
+                id INTEGER PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                since REAL NOT NULL
+            )
+            """,
+        )
+
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO key (id, name, rate, capacity, tokens, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                "rate = excluded.rate, capacity = excluded.capacity",
+                (
+                    (key_id, name, rpm / 60, burst, burst, time.time())
+                    for key_id, (name, _) in self.keys.items()
+                ),
+            )
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        with self.lock:
+            cursor: sqlite3.Cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+
+    def try_acquire(self, priority: int) -> tuple[str | None, float]:
+        now: float = time.time()
+        placeholders: str = ", ".join("?" * len(self.keys))
+        reserve: float = self.reserve if priority > 0 else 0.0
+
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE key SET "
+                "tokens = MIN(capacity, tokens + (? - updated_at) * rate), "
+                f"updated_at = ? WHERE id IN ({placeholders})",
+                (now, now, *self.keys),
+            )
+            cursor.execute("DELETE FROM waiter WHERE since < ?", (now - WAITER_TTL,))
+
+            if cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM waiter WHERE priority < ?)",
+                (priority,),
+            ).fetchone()[0]:
+                return None, self.poll
+
+            rows: list[tuple[str, float, float, float]] = cursor.execute(
+                "SELECT id, tokens, rate, cooldown_until FROM key "
+                f"WHERE id IN ({placeholders}) AND cooldown_until <= ? "
+                "ORDER BY tokens DESC, COALESCE(latency, 0)",
+                (*self.keys, now),
+            ).fetchall()
+
+            if rows and rows[0][1] >= 1 + reserve:
+                cursor.execute(
+                    "UPDATE key SET tokens = tokens - 1, in_flight = in_flight + 1, "
+                    "calls = calls + 1 WHERE id = ?",
+                    (rows[0][0],),
+                )
+
+                return rows[0][0], 0.0
+
+            cooldown: float | None = cursor.execute(
+                f"SELECT MIN(cooldown_until) FROM key WHERE id IN ({placeholders})",
+                tuple(self.keys),
+            ).fetchone()[0]
+
+        return None, max(
+            self.poll,
+            min(
+                [(1 + reserve - tokens) / rate for _, tokens, rate, _ in rows]
+                or [cooldown - now if cooldown else self.poll],
+            ),
+        )
+
+    def release(
+        self,
+        key_id: str,
+        latency: float,
+        *,
+        ok: bool,
+        rate_limited: bool,
+    ) -> None:
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE key SET in_flight = MAX(in_flight - 1, 0), "
+                "successes = successes + ?, failures = failures + ?, "
+                "rate_limited = rate_limited + ?, "
+                "latency = COALESCE(latency * 0.8 + ? * 0.2, ?) WHERE id = ?",
+                (int(ok), int(not ok), int(rate_limited), latency, latency, key_id),
+            )
+
+            if rate_limited:
+                cursor.execute(
+                    "UPDATE key SET tokens = 0, updated_at = ?, cooldown_until = ? "
+                    "WHERE id = ?",
+                    (time.time(), time.time() + self.cooldown, key_id),
+                )
+
+    def wait(self, priority: int) -> int:
+        with self.transaction() as cursor:
+            return cursor.execute(
+                "INSERT INTO waiter (priority, since) VALUES (?, ?)",
+                (priority, time.time()),
+            ).lastrowid
+
+    def done_waiting(self, waiter_id: int) -> None:
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM waiter WHERE id = ?", (waiter_id,))
+
+    def lease_for(self, key_id: str) -> Lease:
+        name, client = self.keys[key_id]
+
+        return Lease(key_id=key_id, name=name, client=client)
+
+    def finish(self, lease: Lease, start: float, error: BaseException | None) -> None:
+        self.release(
+            key_id=lease.key_id,
+            latency=time.perf_counter() - start,
+            ok=error is None,
+            rate_limited=getattr(error, "code", None) == 429,
+        )
+
+    @contextlib.contextmanager
+    def lease(self, lane: str = "chat") -> Iterator[Lease]:
+        waiter_id: int = self.wait(priority=LANES[lane])
+
+        try:
+            while True:
+                key_id, delay = self.try_acquire(priority=LANES[lane])
+
+                if key_id is not None:
+                    break
+
+                time.sleep(delay)
+        finally:
+            self.done_waiting(waiter_id=waiter_id)
+
+        lease: Lease = self.lease_for(key_id=key_id)
+        start: float = time.perf_counter()
+
+        try:
+            yield lease
+        except BaseException as e:
+            self.finish(lease=lease, start=start, error=e)
+            raise
+        else:
+            self.finish(lease=lease, start=start, error=None)
+
+    @contextlib.asynccontextmanager
+    async def lease_async(self, lane: str = "qa") -> AsyncIterator[Lease]:
+        waiter_id: int = self.wait(priority=LANES[lane])
+
+        try:
+            while True:
+                key_id, delay = self.try_acquire(priority=LANES[lane])
+
+                if key_id is not None:
+                    break
+
+                await asyncio.sleep(delay=delay)
+        finally:
+            self.done_waiting(waiter_id=waiter_id)
+
+        lease: Lease = self.lease_for(key_id=key_id)
+        start: float = time.perf_counter()
+
+        try:
+            yield lease
+        except BaseException as e:
+            self.finish(lease=lease, start=start, error=e)
+            raise
+        else:
+            self.finish(lease=lease, start=start, error=None)
+
+    def usage(self) -> list[KeyUsage]:
+        now: float = time.time()
+
+        with self.lock:
+            return [
+                KeyUsage(
+                    name=name,
+                    tokens=min(capacity, tokens + (now - updated_at) * rate),
+                    capacity=capacity,
+                    in_flight=in_flight,
+                    calls=calls,
+                    successes=successes,
+                    failures=failures,
+                    rate_limited=rate_limited,
+                    latency=latency,
+                    cooldown=max(0.0, cooldown_until - now),
+                )
+                for (
+                    name,
+                    rate,
+                    capacity,
+                    tokens,
+                    updated_at,
+                    cooldown_until,
+                    in_flight,
+                    calls,
+                    successes,
+                    failures,
+                    rate_limited,
+                    latency,
+                ) in self.connection.execute(
+                    "SELECT name, rate, capacity, tokens, updated_at, cooldown_until, "
+                    "in_flight, calls, successes, failures, rate_limited, latency "
+                    "FROM key WHERE id IN ({}) ORDER BY name".format(
+                        ", ".join("?" * len(self.keys)),
+                    ),
+                    tuple(self.keys),
+                )
+            ]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tampilkan pemakaian kunci API.")
+    parser.add_argument(
+        "--path",
+        type=Path,
+        default=Path("var/00_cache/keypool.sqlite3"),
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    pool = KeyPool(path=args.path)
+
+    for usage in pool.usage():
+        print(usage)  # noqa: T201
+
+    pool.close()
@@ -0,0 +1,393 @@
+import math
+import re
+import typing
+from collections.abc import Iterable
+from pathlib import Path
+
+import chromadb
+import polars as pl
+import store
+
+TOKEN_PATTERN = r"\w+"
+
+STOPWORDS = [
+    "ada",
+    "adalah",
+    "akan",
+    "apa",
+    "apakah",
+    "atas",
+    "atau",
+    "bagaimana",
+    "bagi",
+    "berapa",
+    "dalam",
+    "dan",
+    "dari",
+    "dengan",
+    "di",
+    "ini",
+    "itu",
+    "jika",
+    "ke",
+    "oleh",
+    "pada",
+    "saya",
+    "sebagai",
+    "tersebut",
+    "tidak",
+    "untuk",
+    "yang",
+]
+
+ALIASES: dict[str, list[str]] = {
+    "undang-undang": ["uu"],
+    "peraturan pemerintah": ["pp"],
+    "peraturan menteri keuangan": ["pmk"],
+    "keputusan menteri keuangan": ["kmk"],
+    "peraturan direktur jenderal pajak": ["perdirjen"],
+    "keputusan direktur jenderal pajak": ["kepdirjen"],
+}
+
+CODE_PATTERN = re.compile(
+    pattern=r"\b(?:[a-z]+\s*-\s*)?\d{1,4}(?:\s*/\s*[a-z0-9.]+)*?\s*/\s*(?:19|20)\d{2}\b",
+    flags=re.IGNORECASE,
+)
+
+DOC_FIELDS = ["jenis_peraturan", "nomor_peraturan", "perihal", "keywords", "answer"]
+
+BM25_K1 = 1.2
+
+BM25_B = 0.75
+
+RRF_K = 60
+
+
+def normalise(text: str) -> str:
+    return " ".join(re.findall(pattern=r"[a-z0-9]+", string=text.lower()))
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        token
+        for token in re.findall(pattern=TOKEN_PATTERN, string=text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def records(collection: chromadb.Collection, batch_size: int) -> pl.DataFrame:
+    frames: list[pl.DataFrame] = []
+
+    for offset in range(0, collection.count(), batch_size):
+        get_result: chromadb.GetResult = collection.get(
+            include=["documents", "metadatas"],
+            limit=batch_size,
+            offset=offset,
+        )
+        frames.append(
+            pl.DataFrame(
+                data={
+                    "id": get_result["ids"],
+                    "question": get_result["documents"],
+                    "metadata": get_result["metadatas"],
+                },
+            ),
+        )
+
+    return (
+        pl.concat(items=frames)
+        .unnest(columns="metadata")
+        .select("id", "permalink", "question", "answer", "status_dokumen")
+        if frames
+        else pl.DataFrame(
+            schema=dict.fromkeys(
+                ["id", "permalink", "question", "answer", "status_dokumen"],
+                pl.Utf8,
+            ),
+        )
+    )
+
+
+def citations(regulation: pl.LazyFrame) -> pl.LazyFrame:
+    jenis: pl.Expr = pl.col(name="jenis_peraturan").str.to_lowercase()
+    nomor: pl.Expr = pl.col(name="nomor_peraturan").str.to_lowercase()
+
+    return (
+        regulation.select(
+            pl.col(name="permalink"),
+            pl.concat_list(
+                jenis.str.replace_all(
+                    pattern=r"[^a-z0-9]+",
+                    value=" ",
+                ).str.strip_chars(),
+                jenis.str.extract_all(pattern=r"\b[a-z]").list.join(separator=""),
+                jenis.replace_strict(
+                    old=list(ALIASES),
+                    new=list(ALIASES.values()),
+                    default=[],
+                    return_dtype=pl.List(inner=pl.Utf8),
+                ),
+            ).alias(name="alias"),
+            nomor.str.extract(pattern=r"(\d+)", group_index=1)
+            .cast(dtype=pl.Int64, strict=False)
+            .alias(name="number"),
+            nomor.str.extract_all(pattern=r"\b(?:19|20)\d{2}\b")
+            .list.last()
+            .cast(dtype=pl.Int64, strict=False)
+            .alias(name="year"),
+            pl.when(nomor.str.contains(pattern="/", literal=True))
+            .then(nomor.str.replace_all(pattern=r"\s+", value=""))
+            .alias(name="code"),
+            pl.col(name="status_dokumen"),
+        )
+        .explode(columns="alias")
+        .filter(
+            pl.col(name="alias").str.len_chars() > 0,
+            pl.col(name="number").is_not_null(),
+        )
+        .unique()
+    )
+
+
+def build(
+    collection: chromadb.Collection,
+    regulation: pl.DataFrame,
+    batch_size: int = 5000,
+) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    docs: pl.DataFrame = (
+        records(collection=collection, batch_size=batch_size)
+        .join(
+            other=regulation.select(
+                "permalink",
+                "jenis_peraturan",
+                "nomor_peraturan",
+                "perihal",
+                "keywords",
+            ),
+            on="permalink",
+            how="left",
+        )
+        .with_columns(
+            pl.concat_str(
+                exprs=[pl.col(name="question"), *DOC_FIELDS],
+                separator=" ",
+                ignore_nulls=True,
+            )
+            .str.to_lowercase()
+            .str.extract_all(pattern=TOKEN_PATTERN)
+            .list.filter(predicate=~pl.element().is_in(other=STOPWORDS))
+            .alias(name="terms"),
+        )
+        .sort(by="id")
+        .with_row_index(name="doc")
+    )
+
+    postings: pl.DataFrame = (
+        docs.select("doc", "terms")
+        .explode(columns="terms")
+        .drop_nulls()
+        .group_by("terms", "doc")
+        .agg(pl.len().cast(dtype=pl.UInt32).alias(name="tf"))
+        .rename(mapping={"terms": "term"})
+        .sort(by=["term", "doc"])
+    )
+
+    return (
+        docs.select(
+            "doc",
+            "id",
+            "permalink",
+            "status_dokumen",
+            pl.col(name="terms").list.len().cast(dtype=pl.UInt32).alias(name="length"),
+        ),
+        postings,
+        citations(regulation=regulation.lazy()).collect(),
+    )
+
+
+def write(
+    collection: chromadb.Collection,
+    regulation: pl.DataFrame,
+    path: Path,
+) -> int:
+    docs, postings, citation = build(collection=collection, regulation=regulation)
+
+    store.write(df=docs, path=path / "lexical_docs.parquet")
+    store.write(df=postings, path=path / "lexical_postings.parquet")
+    store.write(df=citation, path=path / "citation.parquet")
+
+    return docs.height
+
+
+def rrf(rankings: Iterable[list[str]], k: int = RRF_K) -> list[str]:
+    scores: dict[str, float] = {}
+
+    for ranking in rankings:
+        for rank, id_ in enumerate(iterable=ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1 / (k + rank)
+
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+class LexicalIndex:
+    def __init__(
+        self,
+        docs: pl.DataFrame,
+        postings: pl.DataFrame,
+        citation: pl.DataFrame,
+    ) -> None:
+        self.docs: pl.DataFrame = docs
+        self.postings: pl.DataFrame = postings
+        self.citation: pl.DataFrame = citation
+        self.avg_length: float = docs["length"].mean() or 0.0
+        self.offsets: dict[str, tuple[int, int]] = {
+            term: (offset, length)
+            for term, offset, length in postings.group_by("term", maintain_order=True)
+            .agg(pl.len().alias(name="length"))
+            .with_columns(
+                pl.col(name="length")
+                .cum_sum()
+                .shift(n=1, fill_value=0)
+                .alias("offset"),
+            )
+            .select("term", "offset", "length")
+            .iter_rows()
+        }
+        self.citation_pattern: re.Pattern | None = (
+            re.compile(
+                pattern=r"\b(?P<alias>{})\s+(?:nomor\s+|no\.?\s*)?(?P<number>\d{{1,4}})"
+                r"(?:\s+tahun\s+|\s*/\s*)(?P<year>(?:19|20)\d{{2}})\b".format(
+                    "|".join(
+                        r"[\s-]+".join(map(re.escape, alias.split()))
+                        for alias in sorted(
+                            citation["alias"].unique(),
+                            key=len,
+                            reverse=True,
+                        )
+                    ),
+                ),
+                flags=re.IGNORECASE,
+            )
+            if citation.height
+            else None
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> typing.Optional["LexicalIndex"]:
+        if not all(
+            (path / name).exists()
+            for name in [
+                "lexical_docs.parquet",
+                "lexical_postings.parquet",
+                "citation.parquet",
+            ]
+        ):
+            return None
+
+        return cls(
+            docs=pl.read_parquet(source=path / "lexical_docs.parquet"),
+            postings=pl.read_parquet(source=path / "lexical_postings.parquet"),
+            citation=pl.read_parquet(source=path / "citation.parquet"),
+        )
+
+    def cite(self, query: str, include: list[str] | None = None) -> str | None:
+        if self.citation_pattern is None:
+            return None
+
+        matches: list[pl.Expr] = [
+            pl.col(name="code")
+            == re.sub(pattern=r"\s+", repl="", string=match[0]).lower()
+            for match in CODE_PATTERN.finditer(string=query)
+        ] + [
+            (pl.col(name="alias") == normalise(text=match["alias"]))
+            & (pl.col(name="number") == int(match["number"]))
+            & (
+                pl.col(name="year").is_null()
+                | (pl.col(name="year") == int(match["year"]))
+            )
+            for match in self.citation_pattern.finditer(string=query)
+        ]
+
+        if not matches:
+            return None
+
+        candidates: pl.DataFrame = self.citation.filter(pl.any_horizontal(matches))
+
+        if include is not None:
+            candidates: pl.DataFrame = candidates.filter(
+                pl.col(name="status_dokumen").is_in(other=include),
+            )
+
+        permalinks: set[str] = set(candidates["permalink"])
+
+        return permalinks.pop() if len(permalinks) == 1 else None
+
+    def search(
+        self,
+        query: str,
+        n: int,
+        include: list[str] | None = None,
+        permalink: str | None = None,
+    ) -> list[str]:
+        postings: list[pl.DataFrame] = [
+            self.postings.slice(offset=offset, length=length).with_columns(
+                pl.lit(
+                    value=math.log(
+                        1 + (self.docs.height - length + 0.5) / (length + 0.5),
+                    ),
+                ).alias(name="idf"),
+            )
+            for offset, length in (
+                self.offsets[term]
+                for term in set(tokenize(text=query))
+                if term in self.offsets
+            )
+        ]
+
+        docs: pl.DataFrame = self.docs
+
+        if include is not None:
+            docs: pl.DataFrame = docs.filter(
+                pl.col(name="status_dokumen").is_in(other=include),
+            )
+
+        if permalink is not None:
+            docs: pl.DataFrame = docs.filter(pl.col(name="permalink") == permalink)
+
+        if not postings:
+            return docs["id"].head(n=n).to_list() if permalink is not None else []
+
+        scored: pl.DataFrame = (
+            pl.concat(items=postings)
+            .join(other=docs.select("doc", "id", "length"), on="doc")
+            .group_by("id")
+            .agg(
+                (
+                    pl.col(name="idf")
+                    * pl.col(name="tf")
+                    * (BM25_K1 + 1)
+                    / (
+                        pl.col(name="tf")
+                        + BM25_K1
+                        * (
+                            1
+                            - BM25_B
+                            + BM25_B * pl.col(name="length") / self.avg_length
+                        )
+                    )
+                )
+                .sum()
+                .alias(name="score"),
+            )
+            .sort(by=["score", "id"], descending=[True, False])
+        )
+
+        if permalink is not None and scored.height < n:
+            return [
+                *scored["id"],
+                *docs.join(other=scored, on="id", how="anti")["id"].head(
+                    n=n - scored.height,
+                ),
+            ]
+
+        return scored["id"].head(n=n).to_list()
@@ -0,0 +1,213 @@
+import cProfile
+import datetime
+import resource
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+import polars as pl
+import pydantic
+
+
+class Stage(pydantic.BaseModel):
+    name: str
+    output: Path | None
+    run: Callable[[], int]
+    depends: list[str] = []
+
+    def is_done(self) -> bool:
+        return self.output is not None and self.output.exists()
+
+
+class StageReport(pydantic.BaseModel):
+    name: str
+    status: str
+    output: str | None = None
+    wall: float = 0.0
+    cpu: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    rss_peak: int = 0
+    rss_growth: int = 0
+    tracemalloc_peak: int | None = None
+    profile: str | None = None
+    error: str | None = None
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_out / self.wall if self.wall else 0.0
+
+    def __str__(self) -> str:
+        if self.status == "skipped":
+            return f"{self.name}: dilewati, {self.output} sudah ada."
+
+        return (
+            f"{self.name}: {'gagal' if self.status == 'failed' else 'selesai'} "
+            f"dalam {self.wall:.2f} detik "
+            f"(CPU {self.cpu:.2f} detik), {self.rows_in} baris masuk, "
+            f"{self.rows_out} baris keluar ({self.rows_per_sec:.2f} baris/detik), "
+            f"RSS puncak {self.rss_peak / 2**20:.1f} MiB "
+            f"(+{self.rss_growth / 2**20:.1f} MiB)"
+            + (
+                f", tracemalloc puncak {self.tracemalloc_peak / 2**20:.1f} MiB"
+                if self.tracemalloc_peak is not None
+                else ""
+            )
+        )
+
+
+class RunReport(pydantic.BaseModel):
+    started_at: datetime.datetime
+    wall: float = 0.0
+    stages: list[StageReport] = []
+
+    def save(self, path: Path) -> Path:
+        path.mkdir(parents=True, exist_ok=True)
+        (
+            report := path
+            / f"run-{self.started_at.strftime(format='%Y%m%d%H%M%S')}.json"
+        ).write_text(data=self.model_dump_json(indent=2))
+
+        return report
+
+
+def count_rows(path: Path | None) -> int:
+    return (
+        pl.scan_parquet(source=path).select(pl.len()).collect().item()
+        if path is not None and path.suffix == ".parquet" and path.exists()
+        else 0
+    )
+
+
+def rss_peak() -> int:
+    usage: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def cpu_time() -> float:
+    children: resource.struct_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: Iterable[Stage],
+        report_path: Path = Path("var/04_report"),
+    ) -> None:
+        self.stages: dict[str, Stage] = {stage.name: stage for stage in stages}
+        self.report_path: Path = report_path
+
+    def ancestors(self, name: str) -> list[str]:
+        names: list[str] = []
+
+        for depend in self.stages[name].depends:
+            names += [*self.ancestors(name=depend), depend]
+
+        return names
+
+    def plan(self, targets: Iterable[str] | None = None) -> list[Stage]:
+        if targets is None:
+            return list(self.stages.values())
+
+        selected: set[str] = set()
+
+        for target in targets:
+            selected.update([*self.ancestors(name=target), target])
+
+        return [stage for name, stage in self.stages.items() if name in selected]
+
+    def run_stage(
+        self,
+        stage: Stage,
+        report: StageReport,
+        *,
+        profile: bool,
+        trace: bool,
+    ) -> None:
+        report.status = "ran"
+        report.rows_in = sum(
+            count_rows(path=self.stages[depend].output) for depend in stage.depends
+        )
+        profiler: cProfile.Profile | None = cProfile.Profile() if profile else None
+
+        if trace:
+            tracemalloc.start()
+
+        rss_before: int = rss_peak()
+        cpu_before: float = cpu_time()
+        wall_before: float = time.perf_counter()
+
+        try:
+            if profiler:
+                profiler.enable()
+
+            report.rows_out = stage.run()
+        except BaseException as e:
+            report.status = "failed"
+            report.error = repr(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+                self.report_path.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(
+                    file=(prof := self.report_path / f"{stage.name}.prof"),
+                )
+                report.profile = str(object=prof)
+
+            report.wall = time.perf_counter() - wall_before
+            report.cpu = cpu_time() - cpu_before
+            report.rss_peak = rss_peak()
+            report.rss_growth = report.rss_peak - rss_before
+
+            if trace:
+                report.tracemalloc_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            print(report)  # noqa: T201
+
+    def run(
+        self,
+        targets: Iterable[str] | None = None,
+        force: Iterable[str] = (),
+        *,
+        profile: bool = False,
+        trace: bool = False,
+    ) -> RunReport:
+        run = RunReport(started_at=datetime.datetime.now(tz=datetime.UTC))
+        start: float = time.perf_counter()
+        rerun: set[str] = set(force)
+
+        try:
+            for stage in self.plan(targets=targets):
+                run.stages.append(
+                    report := StageReport(
+                        name=stage.name,
+                        status="skipped",
+                        output=str(object=stage.output) if stage.output else None,
+                    ),
+                )
+
+                if (
+                    stage.is_done()
+                    and stage.name not in rerun
+                    and not rerun.intersection(stage.depends)
+                ):
+                    print(report)  # noqa: T201
+                    continue
+
+                rerun.add(stage.name)
+                self.run_stage(stage=stage, report=report, profile=profile, trace=trace)
+        finally:
+            run.wall = time.perf_counter() - start
+            print(  # noqa: T201
+                f"\nTotal waktu: {run.wall:.2f} detik, laporan: "
+                f"{run.save(path=self.report_path)}",
+            )
+
+        return run
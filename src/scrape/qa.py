@@ -0,0 +1,513 @@
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import random
+import sqlite3
+import time
+import typing
+from collections.abc import Iterable
+from pathlib import Path
+
+import httpx
+import keypool
+import polars as pl
+import pydantic
+from crawler import load_config
+from google.genai import errors, types
+
+MODEL = "gemini-2.0-flash-lite"
+
+SYSTEM_INSTRUCTION = """
+Buatlah daftar pertanyaan dan jawaban yang menyeluruh berdasarkan isi peraturan yang
+diberikan, dalam bahasa Indonesia yang jelas dan mudah dipahami.
+
+Keluaran yang diharapkan adalah dalam bentuk JSON array, di mana setiap item adalah
+objek yang memiliki dua field:
+- "question": pertanyaan yang relevan dan penting terkait dengan isi peraturan, yang
+dapat mencakup aspek-aspek seperti tujuan peraturan, definisi istilah penting, kewajiban
+atau hak yang diatur, sanksi atau konsekuensi pelanggaran, dan lain-lain.
+- "answer": jawaban lengkap dan informatif yang menjawab pertanyaan tersebut,
+berdasarkan isi peraturan yang diberikan. Jawaban harus mencakup informasi penting dari
+peraturan, dan harus ditulis dalam bahasa Indonesia yang formal dan mudah dipahami.
+Pastikan untuk tidak mengulangi pertanyaan dalam jawaban, dan fokus pada memberikan
+jawaban yang tepat dan relevan.
+"""
+
+QA_DTYPE = pl.List(
+    inner=pl.Struct(
+        fields=[
+            pl.Field(name="question", dtype=pl.Utf8),
+            pl.Field(name="answer", dtype=pl.Utf8),
+            pl.Field(name="chunk", dtype=pl.Utf8),
+        ],
+    ),
+)
+
+FAILED_QA_LIST = pl.lit(
+    value=[
+        {
+            "question": "Failed to generate.",
+            "answer": "Failed to generate.",
+            "chunk": None,
+        },
+    ],
+    dtype=QA_DTYPE,
+)
+
+
+class QAItem(pydantic.BaseModel):
+    question: str
+    answer: str
+
+
+class QAList(pydantic.BaseModel):
+    qa_list: list[QAItem]
+
+
+def chunk_text(text: str, chunk_size: int, overlap: int) -> list[dict]:
+    chunks: list[dict] = []
+    start = 0
+    chunk_num = 1
+
+    while start < len(text):
+        end: int = start + chunk_size
+        chunks.append(
+            {
+                "chunk": text[start:end],
+                "chunk_num": f"{chunk_size}-{chunk_num}",
+            },
+        )
+        start += chunk_size - overlap
+        chunk_num += 1
+
+    return chunks
+
+
+def merge_qa_lists(
+    qa_lists: list[tuple[str | None, list[QAItem]]],
+) -> list[dict[str, str | None]]:
+    merged: dict[str, dict[str, str | None]] = {}
+
+    for chunk, qa_list in qa_lists:
+        for qa_item in qa_list:
+            merged.setdefault(
+                " ".join(qa_item.question.lower().split()),
+                {**qa_item.model_dump(), "chunk": chunk},
+            )
+
+    return list(merged.values())
+
+
+class QAStats(pydantic.BaseModel):
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    pairs: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    chunked: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    elapsed: float = 0.0
+    calls: dict[str, int] = {}
+
+    @property
+    def per_sec(self) -> float:
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.done}/{self.total} regulasi, {self.pairs} pasang "
+            f"pertanyaan-jawaban, {self.failed} gagal dalam {self.elapsed:.2f} detik "
+            f"({self.per_sec:.2f} regulasi/detik), {self.retries} percobaan ulang, "
+            f"{self.rate_limited} kali terkena batas, {self.chunked} dipotong, "
+            f"cache {self.cache_hits} hit {self.cache_misses} miss"
+        )
+
+
+class QACache:
+    def __init__(self, path: Path = Path("var/00_cache/qa.sqlite3")) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(database=path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS qa (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_sha256 TEXT NOT NULL,
+                qa_list TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+        )
+
+    @staticmethod
+    def sha256(text: str) -> str:
+        return hashlib.sha256(string=text.encode()).hexdigest()
+
+    @classmethod
+    def key(cls, regulation: str, system_instruction: str, model: str) -> str:
+        return cls.sha256(
+            text=json.dumps(obj=[regulation, system_instruction.strip(), model]),
+        )
+
+    def get(
+        self,
+        regulation: str,
+        system_instruction: str,
+        model: str,
+    ) -> list[QAItem] | None:
+        key: str = self.key(
+            regulation=regulation,
+            system_instruction=system_instruction,
+            model=model,
+        )
+
+        if (
+            row := self.connection.execute(
+                "SELECT qa_list FROM qa WHERE key = ?",
+                (key,),
+            ).fetchone()
+        ) is None:
+            return None
+
+        with self.connection:
+            self.connection.execute(
+                "UPDATE qa SET used_at = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+
+        return QAList.model_validate_json(json_data=row[0]).qa_list
+
+    def put(
+        self,
+        regulation: str,
+        system_instruction: str,
+        model: str,
+        qa_list: list[QAItem],
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO qa VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (
+                    self.key(
+                        regulation=regulation,
+                        system_instruction=system_instruction,
+                        model=model,
+                    ),
+                    model,
+                    self.sha256(text=system_instruction.strip()),
+                    QAList(qa_list=qa_list).model_dump_json(),
+                    time.time(),
+                    time.time(),
+                ),
+            )
+
+    def evict(
+        self,
+        older_than: datetime.timedelta | None = None,
+        model: str | None = None,
+        system_instruction: str | None = None,
+    ) -> int:
+        clauses: list[str] = []
+        params: list[typing.Any] = []
+
+        if older_than is not None:
+            clauses.append("used_at < ?")
+            params.append(time.time() - older_than.total_seconds())
+
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+
+        if system_instruction is not None:
+            clauses.append("prompt_sha256 != ?")
+            params.append(self.sha256(text=system_instruction.strip()))
+
+        if not clauses:
+            raise ValueError("Tentukan minimal satu kriteria penghapusan cache QA.")
+
+        with self.connection:
+            return self.connection.execute(
+                f"DELETE FROM qa WHERE {' AND '.join(clauses)}",
+                params,
+            ).rowcount
+
+    def summary(self) -> list[tuple[str, int, int]]:
+        return self.connection.execute(
+            "SELECT model, COUNT(*), SUM(hits) FROM qa GROUP BY model ORDER BY model",
+        ).fetchall()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class QAEngine:
+    def __init__(
+        self,
+        api_keys: list[str] | None = None,
+        model: str = MODEL,
+        system_instruction: str = SYSTEM_INSTRUCTION,
+        rpm: float = 30,
+        concurrency_per_key: int = 2,
+        max_retries: int = 5,
+        backoff_base: float = 2.0,
+        backoff_cap: float = 60.0,
+        cooldown: float = 60.0,
+        cache: QACache | None = None,
+        chunk_size: int = 20000,
+        overlap: int = 1000,
+        pool: keypool.KeyPool | None = None,
+        lane: str = "qa",
+    ) -> None:
+        api_keys = api_keys or load_config()["api_keys"]
+        self.model: str = model
+        self.system_instruction: str = system_instruction
+        self.pool: keypool.KeyPool = pool or keypool.KeyPool(
+            api_keys=api_keys,
+            rpm=rpm,
+            cooldown=cooldown,
+        )
+        self.lane: str = lane
+        self.semaphore = asyncio.Semaphore(value=len(api_keys) * concurrency_per_key)
+        self.max_retries: int = max_retries
+        self.backoff_base: float = backoff_base
+        self.backoff_cap: float = backoff_cap
+        self.cache: QACache | None = cache
+        self.chunk_size: int = chunk_size
+        self.overlap: int = overlap
+        self.stats = QAStats()
+
+    async def generate(self, regulation: str) -> list[QAItem]:
+        attempt: int = 0
+
+        while True:
+            try:
+                async with self.pool.lease_async(lane=self.lane) as lease:
+                    self.stats.calls[lease.name] = (
+                        self.stats.calls.get(lease.name, 0) + 1
+                    )
+                    response: types.GenerateContentResponse = (
+                        await lease.client.aio.models.generate_content(
+                            model=self.model,
+                            contents=regulation,
+                            config=types.GenerateContentConfig(
+                                system_instruction=self.system_instruction,
+                                temperature=0.1,
+                                response_mime_type="application/json",
+                                response_schema=QAList,
+                            ),
+                        )
+                    )
+
+                return QAList.model_validate_json(json_data=response.text).qa_list
+
+            except (
+                errors.APIError,
+                httpx.TimeoutException,
+                httpx.TransportError,
+                ValueError,
+            ) as e:
+                if isinstance(e, errors.ClientError):
+                    if e.code != 429:
+                        raise
+
+                    self.stats.rate_limited += 1
+
+                if attempt == self.max_retries:
+                    raise
+
+                self.stats.retries += 1
+                await asyncio.sleep(
+                    delay=random.uniform(
+                        a=0,
+                        b=min(self.backoff_cap, self.backoff_base * 2**attempt),
+                    ),
+                )
+                attempt += 1
+
+    async def run_chunk(self, text: str) -> list[QAItem]:
+        if (
+            self.cache
+            and (
+                qa_list := self.cache.get(
+                    regulation=text,
+                    system_instruction=self.system_instruction,
+                    model=self.model,
+                )
+            )
+            is not None
+        ):
+            self.stats.cache_hits += 1
+
+            return qa_list
+
+        self.stats.cache_misses += 1
+
+        async with self.semaphore:
+            qa_list: list[QAItem] = await self.generate(regulation=text)
+
+        if self.cache:
+            self.cache.put(
+                regulation=text,
+                system_instruction=self.system_instruction,
+                model=self.model,
+                qa_list=qa_list,
+            )
+
+        return qa_list
+
+    async def run_one(self, regulation: str) -> list[dict[str, str | None]]:
+        try:
+            if len(regulation) <= self.chunk_size:
+                qa_lists: list[tuple[str | None, list[QAItem]]] = [
+                    (None, await self.run_chunk(text=regulation)),
+                ]
+            else:
+                self.stats.chunked += 1
+
+                async with asyncio.TaskGroup() as tg:
+                    tasks: list[tuple[str, asyncio.Task[list[QAItem]]]] = [
+                        (
+                            chunk["chunk_num"],
+                            tg.create_task(coro=self.run_chunk(text=chunk["chunk"])),
+                        )
+                        for chunk in chunk_text(
+                            text=regulation,
+                            chunk_size=self.chunk_size,
+                            overlap=self.overlap,
+                        )
+                    ]
+
+                qa_lists: list[tuple[str | None, list[QAItem]]] = [
+                    (chunk_num, task.result()) for chunk_num, task in tasks
+                ]
+        except Exception as e:
+            self.stats.failed += 1
+            print(  # noqa: T201
+                f"{self.stats.done + self.stats.failed:> 5}/{self.stats.total}, "
+                f"gagal: {e}",
+            )
+            raise
+
+        qa_list: list[dict[str, str | None]] = merge_qa_lists(qa_lists=qa_lists)
+
+        self.stats.done += 1
+        self.stats.pairs += len(qa_list)
+        print(  # noqa: T201
+            f"{self.stats.done + self.stats.failed:> 5}/{self.stats.total}, "
+            f"{len(qa_list):> 5} pasang pertanyaan-jawaban"
+            f"{f' dari {len(qa_lists)} potongan' if len(qa_lists) > 1 else ''}.",
+        )
+
+        return qa_list
+
+    async def run(
+        self,
+        regulations: Iterable[str],
+    ) -> tuple[pl.Series, list[int]]:
+        start: float = time.perf_counter()
+
+        batch: list[str] = list(regulations)
+        self.stats.total = len(batch)
+
+        results: list[list[dict] | BaseException] = await asyncio.gather(
+            *(self.run_one(regulation=regulation) for regulation in batch),
+            return_exceptions=True,
+        )
+
+        self.stats.elapsed = time.perf_counter() - start
+
+        return (
+            pl.Series(
+                name="qa_list",
+                values=[
+                    None if isinstance(result, BaseException) else result
+                    for result in results
+                ],
+                dtype=QA_DTYPE,
+            ),
+            [
+                i
+                for i, result in enumerate(results)
+                if isinstance(result, BaseException)
+            ],
+        )
+
+
+def generate_qa_lists(
+    regulations: Iterable[str],
+    cache_path: Path | None = Path("var/00_cache/qa.sqlite3"),
+    **kwargs: typing.Any,
+) -> tuple[pl.Series, list[int]]:
+    cache: QACache | None = QACache(path=cache_path) if cache_path else None
+
+    engine = QAEngine(cache=cache, **kwargs)
+
+    try:
+        qa_lists, failed = asyncio.run(main=engine.run(regulations=regulations))
+    finally:
+        if cache:
+            cache.close()
+
+        if "pool" not in kwargs:
+            engine.pool.close()
+
+    print(engine.stats)  # noqa: T201
+
+    return qa_lists, failed
+
+
+def with_qa_lists(
+    df: pl.DataFrame,
+    column: str = "body_final",
+    **kwargs: typing.Any,
+) -> pl.DataFrame:
+    return df.with_columns(
+        generate_qa_lists(regulations=df[column], **kwargs)[0].alias(name=column),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kelola cache hasil pembuatan QA.")
+    parser.add_argument("command", choices=["stats", "evict"])
+    parser.add_argument("--path", type=Path, default=Path("var/00_cache/qa.sqlite3"))
+    parser.add_argument(
+        "--older-than",
+        type=float,
+        help="Hapus entri yang tidak dipakai selama sekian hari.",
+    )
+    parser.add_argument("--model", help="Hapus entri untuk model ini.")
+    parser.add_argument(
+        "--stale-prompt",
+        action="store_true",
+        help="Hapus entri yang dibuat dengan instruksi sistem lain.",
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    if args.command == "evict" and not (
+        args.older_than or args.model or args.stale_prompt
+    ):
+        parser.error("evict butuh --older-than, --model, atau --stale-prompt.")
+
+    cache = QACache(path=args.path)
+
+    if args.command == "evict":
+        removed: int = cache.evict(
+            older_than=(
+                datetime.timedelta(days=args.older_than) if args.older_than else None
+            ),
+            model=args.model,
+            system_instruction=SYSTEM_INSTRUCTION if args.stale_prompt else None,
+        )
+        print(f"{removed} entri dihapus.")  # noqa: T201
+
+    for model, entries, hits in cache.summary():
+        print(f"{model}: {entries} entri, {hits} hit")  # noqa: T201
+
+    cache.close()
@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import polars as pl
+
+TOPIC_SCHEMA = pl.Schema(
+    schema={
+        "uuid": pl.Int64,
+        "keterangan": pl.Utf8,
+    },
+)
+
+REGULATION_SCHEMA = pl.Schema(
+    schema={
+        "permalink": pl.Utf8,
+        "perihal": pl.Utf8,
+        "tanggal_efektif": pl.Date,
+        "status_dokumen": pl.Utf8,
+        "topik": pl.Utf8,
+        "jenis_peraturan": pl.Utf8,
+        "nomor_peraturan": pl.Utf8,
+        "body_final": pl.Utf8,
+        "peraturan_terbaru": pl.Utf8,
+        "peraturan_sebelumnya": pl.Utf8,
+        "peraturan_relevan": pl.Utf8,
+        "keywords": pl.Utf8,
+        "fingerprint": pl.Utf8,
+    },
+)
+
+EMBED_SCHEMA = pl.Schema(
+    schema={
+        "id": pl.Int64,
+        "permalink": pl.Utf8,
+        "question": pl.Utf8,
+        "answer": pl.Utf8,
+        "chunk": pl.Utf8,
+    },
+)
+
+SCHEMAS: dict[str, pl.Schema] = {
+    "topic": TOPIC_SCHEMA,
+    "processed": REGULATION_SCHEMA,
+    "regulation": REGULATION_SCHEMA,
+    "embed": EMBED_SCHEMA,
+}
+
+
+def write(df: pl.DataFrame, path: Path, *, export: bool = False) -> None:
+    if schema := SCHEMAS.get(path.stem):
+        df: pl.DataFrame = df.select(schema.names()).cast(dtypes=dict(schema))
+
+    tmp: Path = path.with_suffix(suffix=".tmp")
+    df.write_parquet(file=tmp)
+    tmp.replace(target=path)
+
+    if export and any(dtype.is_nested() for dtype in df.dtypes):
+        df.write_json(file=path.with_suffix(suffix=".json"))
+    elif export:
+        df.write_csv(file=path.with_suffix(suffix=".csv"))
+
+
+def scan(path: Path) -> pl.LazyFrame:
+    if path.exists() or not (csv := path.with_suffix(suffix=".csv")).exists():
+        frame: pl.LazyFrame = pl.scan_parquet(source=path)
+    else:
+        frame: pl.LazyFrame = pl.scan_csv(
+            source=csv,
+            schema_overrides=SCHEMAS[path.stem],
+        )
+
+    columns: pl.Schema = frame.collect_schema()
+
+    return frame.with_columns(
+        pl.lit(value=None, dtype=dtype).alias(name=name)
+        for name, dtype in SCHEMAS.get(path.stem, {}).items()
+        if name not in columns
+    )
+
+
+def generation(path: Path) -> int:
+    file: Path = path / "generation"
+
+    return int(file.read_text()) if file.exists() else 0
+
+
+def bump_generation(path: Path) -> int:
+    tmp: Path = path / "generation.tmp"
+    tmp.write_text(data=str(object=(value := generation(path=path) + 1)))
+    tmp.replace(target=path / "generation")
+
+    return value
@@ -0,0 +1,595 @@
+import asyncio
+import datetime
+import hashlib
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import chromadb
+import clean
+import crawler
+import embedding
+import facet
+import lexical
+import polars as pl
+import pydantic
+import qa
+import store
+
+LISTING_FIELDS = ["permalink", "perihal", "tanggal_efektif", "status_dokumen", "topik"]
+
+METADATA_FIELDS = ["status_dokumen", "topik", "jenis_peraturan", "nomor_peraturan"]
+
+ROTATION_DAYS = 7
+
+
+class UpdateStats(pydantic.BaseModel):
+    regulations: int = 0
+    rows: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows} baris metadata dari {self.regulations} regulasi "
+            f"diperbarui dalam {self.batches} batch, {self.elapsed:.2f} detik"
+        )
+
+
+def update_metadatas(
+    chroma_client: chromadb.ClientAPI,
+    collection: chromadb.Collection,
+    update: pl.DataFrame,
+) -> UpdateStats:
+    start: float = time.perf_counter()
+    stats = UpdateStats(regulations=update.height)
+    max_batch: int = chroma_client.get_max_batch_size()
+    permalinks: list[str] = update["permalink"].to_list()
+
+    ids: list[str] = []
+    metadatas: list[dict] = []
+
+    for i in range(0, len(permalinks), max_batch):
+        get_result: chromadb.GetResult = collection.get(
+            where={"permalink": {"$in": permalinks[i : i + max_batch]}},
+            include=["metadatas"],
+        )
+        ids += get_result["ids"]
+        metadatas += get_result["metadatas"]
+
+    if not ids:
+        stats.elapsed = time.perf_counter() - start
+
+        return stats
+
+    patched: pl.DataFrame = (
+        pl.from_dicts(data=metadatas, infer_schema_length=None)
+        .drop(METADATA_FIELDS, strict=False)
+        .with_columns(pl.Series(name="id", values=ids))
+        .join(
+            other=update.select(["permalink", *METADATA_FIELDS]),
+            on="permalink",
+            how="inner",
+        )
+    )
+    patched: pl.DataFrame = patched.select(
+        pl.col(name="id"),
+        pl.struct(pl.exclude("id")).alias(name="metadata"),
+    )
+
+    for i in range(0, patched.height, max_batch):
+        batch: pl.DataFrame = patched[i : i + max_batch]
+        collection.update(
+            ids=batch["id"].to_list(),
+            metadatas=[
+                {key: value for key, value in metadata.items() if value is not None}
+                for metadata in batch["metadata"].to_list()
+            ],
+        )
+        stats.batches += 1
+
+    stats.rows = patched.height
+    stats.elapsed = time.perf_counter() - start
+
+    return stats
+
+
+def normalise_body(body: pl.Expr) -> pl.Expr:
+    return body.str.replace_all(pattern=r"\r+|\n+|\t+", value="").str.replace_all(
+        pattern=r"\"",
+        value="'",
+    )
+
+
+def fingerprint(body: pl.Expr) -> pl.Expr:
+    return body.map_batches(
+        function=lambda bodies: pl.Series(
+            values=[
+                None if value is None else hashlib.sha256(value.encode()).hexdigest()
+                for value in bodies
+            ],
+            dtype=pl.Utf8,
+        ),
+        return_dtype=pl.Utf8,
+    )
+
+
+def with_fingerprints(regulation: pl.DataFrame) -> pl.DataFrame:
+    return regulation.with_columns(
+        pl.col(name="fingerprint").fill_null(
+            value=fingerprint(body=pl.col(name="body_final")),
+        ),
+    )
+
+
+def rotation(
+    regulation_old: pl.DataFrame,
+    days: int = ROTATION_DAYS,
+    today: datetime.date | None = None,
+) -> pl.DataFrame:
+    today: datetime.date = today or datetime.datetime.now(tz=datetime.UTC).date()
+
+    return (
+        regulation_old.select("permalink")
+        .sort(by="permalink")
+        .with_row_index()
+        .filter(pl.col(name="index") % days == today.toordinal() % days)
+        .drop("index")
+    )
+
+
+def fetch_fingerprints(permalinks: pl.Series) -> pl.DataFrame:
+    detail, _ = crawler.get_detail_regs(permalinks=permalinks)
+
+    return (
+        permalinks.to_frame()
+        .with_columns(detail)
+        .filter(pl.col(name="detail").is_not_null())
+        .select(
+            pl.col(name="permalink"),
+            fingerprint(
+                body=normalise_body(
+                    body=pl.col(name="detail").struct.field(name="body_final"),
+                ),
+            ).alias(name="fingerprint_fresh"),
+        )
+    )
+
+
+def processed(frame: pl.LazyFrame) -> pl.LazyFrame:
+    return (
+        frame.select(
+            [
+                pl.col(name="permalink"),
+                pl.col(name="perihal"),
+                pl.col(name="tanggal_efektif"),
+                pl.col(name="status_dokumen"),
+                pl.col(name="topik"),
+                pl.col(name="detail").struct.field(
+                    name=[
+                        "jenis_peraturan",
+                        "nomor_peraturan",
+                        "body_final",
+                        "peraturan_terbaru",
+                        "peraturan_sebelumnya",
+                        "peraturan_relevan",
+                    ],
+                ),
+                pl.col(name="detail")
+                .struct.field(name="meta")
+                .struct.field(name="keywords"),
+            ],
+        )
+        .with_columns(
+            [
+                normalise_body(body=pl.col(name="body_final")),
+                pl.col(name="peraturan_terbaru")
+                .list.eval(expr=pl.element().struct.field(name="permalink"))
+                .list.sort()
+                .list.join(separator=" "),
+                pl.col(name="peraturan_sebelumnya")
+                .list.eval(expr=pl.element().struct.field(name="permalink"))
+                .list.sort()
+                .list.join(separator=" "),
+                pl.col(name="peraturan_relevan")
+                .list.eval(expr=pl.element().struct.field(name="permalink"))
+                .list.sort()
+                .list.join(separator=" "),
+            ],
+        )
+        .with_columns(
+            fingerprint(body=pl.col(name="body_final")).alias(name="fingerprint"),
+        )
+    )
+
+
+def embed_rows(embed: pl.DataFrame) -> pl.DataFrame:
+    return (
+        embed.explode(columns="body_final")
+        .unnest(columns="body_final")
+        .with_columns(
+            pl.col(name="permalink")
+            .cum_count()
+            .over(partition_by="permalink")
+            .cast(dtype=pl.Utf8)
+            .alias(name="id"),
+        )
+        .select(
+            [
+                pl.concat_str(
+                    exprs=[pl.col(name="permalink"), pl.col(name="id")],
+                    separator="#",
+                ).alias(name="id"),
+                pl.struct(
+                    [
+                        pl.col(name="answer"),
+                        pl.col(name="permalink"),
+                        pl.col(name="status_dokumen"),
+                        pl.col(name="topik"),
+                        pl.col(name="jenis_peraturan"),
+                        pl.col(name="nomor_peraturan"),
+                        pl.col(name="chunk").fill_null(value=""),
+                    ],
+                ).alias(name="metadata"),
+                pl.col(name="question").alias(name="document"),
+            ],
+        )
+    )
+
+
+class SyncPlan(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    full: bool
+    dry_run: bool = False
+    stored: int
+    listed: int
+    rows: pl.DataFrame
+    elapsed: float
+
+    def action(self, *names: str) -> pl.DataFrame:
+        return self.rows.filter(pl.col(name="action").is_in(other=names))
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {
+            name: self.action(name).height
+            for name in ["new", "changed", "update", "delete", "keep"]
+        }
+
+    def __str__(self) -> str:
+        counts: dict[str, int] = self.counts
+
+        return (
+            f"Mode {'penuh' if self.full else 'inkremental'}: {self.stored} "
+            f"tersimpan, {self.listed} terdaftar; baru {counts['new']}, isi "
+            f"berubah {counts['changed']}, diperbarui {counts['update']}, dihapus "
+            f"{counts['delete']}, tetap {counts['keep']} "
+            f"(rencana dalam {self.elapsed:.2f} detik"
+            + ("; uji coba, isi tidak diperiksa)" if self.dry_run else ")")
+        )
+
+
+class SyncReport(pydantic.BaseModel):
+    added: int = 0
+    refreshed: int = 0
+    deleted: int = 0
+    failed: list[str] = []
+    update: UpdateStats = UpdateStats()
+    embedded: embedding.EmbeddingStats = embedding.EmbeddingStats()
+    timings: dict[str, float] = {}
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.added} regulasi ditambahkan ({self.refreshed} isi berubah), "
+            f"{self.update.regulations} diperbarui, {self.deleted} dihapus, "
+            f"{len(self.failed)} gagal dalam {self.elapsed:.2f} detik ("
+            + ", ".join(
+                f"{name} {elapsed:.2f} detik" for name, elapsed in self.timings.items()
+            )
+            + f"), embedding: {self.embedded}"
+        )
+
+
+class SyncEngine:
+    def __init__(
+        self,
+        chroma_client: chromadb.ClientAPI,
+        collection: chromadb.Collection,
+        path: Path = Path("var/03_final"),
+        full_crawl_interval: datetime.timedelta = datetime.timedelta(days=7),
+        rotation_days: int | None = None,
+        progress: Callable[[str], None] | None = None,
+        embedder: embedding.Embedder | None = None,
+    ) -> None:
+        self.chroma_client: chromadb.ClientAPI = chroma_client
+        self.collection: chromadb.Collection = collection
+        self.path: Path = path
+        self.full_crawl_interval: datetime.timedelta = full_crawl_interval
+        self.rotation_days: int | None = rotation_days
+        self.progress: Callable[[str], None] = progress or (lambda _: None)
+        self.embedder: embedding.Embedder = (
+            embedder
+            or embedding.Embedder.for_collection(
+                collection=collection,
+                cache=embedding.EmbeddingCache(),
+            )
+        )
+
+    @property
+    def path_regulation(self) -> Path:
+        return self.path / "regulation.parquet"
+
+    @property
+    def path_facet(self) -> Path:
+        return self.path / "facet.json"
+
+    @property
+    def path_watermark(self) -> Path:
+        return self.path / "watermark.json"
+
+    def listing(self, watermark: crawler.Watermark, *, full: bool) -> pl.DataFrame:
+        return (
+            pl.DataFrame(
+                data=asyncio.run(
+                    main=crawler.get_all_list_regs(limit=4000)
+                    if full
+                    else crawler.get_new_list_regs(limit=100, watermark=watermark),
+                ),
+            )
+            .unique(subset="permalink")
+            .select(
+                [
+                    pl.col(name="permalink"),
+                    pl.col(name="perihal"),
+                    pl.col(name="tanggal_efektif").str.to_date(format="%d-%m-%Y"),
+                    pl.col(name="status_dokumen"),
+                    pl.col(name="topik")
+                    .list.eval(
+                        expr=pl.element().struct.field(name="uuid").cast(dtype=pl.Utf8),
+                    )
+                    .list.sort()
+                    .list.join(separator=" "),
+                ],
+            )
+            .filter(pl.col(name="topik").str.contains(pattern=r"2|3"))
+        )
+
+    def plan(self, *, full: bool | None = None, dry_run: bool = False) -> SyncPlan:
+        start: float = time.perf_counter()
+        self.progress("Menyusun rencana sinkronisasi.")
+
+        regulation_old: pl.DataFrame = (
+            store.scan(path=self.path_regulation)
+            .collect()
+            .pipe(function=with_fingerprints)
+        )
+        watermark: crawler.Watermark = crawler.Watermark.load(
+            path=self.path_watermark,
+        )
+        full: bool = (
+            watermark.needs_full_crawl(interval=self.full_crawl_interval)
+            if full is None
+            else full
+        )
+        regulation_new: pl.DataFrame = self.listing(watermark=watermark, full=full)
+
+        rows: pl.DataFrame = (
+            regulation_new.lazy()
+            .with_columns(pl.lit(value=True).alias(name="listed"))
+            .join(
+                other=regulation_old.lazy().with_columns(
+                    pl.lit(value=True).alias(name="stored"),
+                ),
+                on="permalink",
+                how="full",
+                coalesce=True,
+                suffix="_old",
+            )
+            .with_columns(
+                pl.col(name="listed").fill_null(value=False),
+                pl.col(name="stored").fill_null(value=False),
+                pl.any_horizontal(
+                    pl.col(name=field) != pl.col(name=f"{field}_old")
+                    for field in LISTING_FIELDS[1:]
+                )
+                .fill_null(value=False)
+                .alias(name="metadata_changed"),
+                *(
+                    pl.coalesce(pl.col(name=field), pl.col(name=f"{field}_old"))
+                    for field in LISTING_FIELDS[1:]
+                ),
+            )
+            .drop(f"{field}_old" for field in LISTING_FIELDS[1:])
+            .collect()
+        )
+
+        checks: list[pl.DataFrame] = [
+            rows.filter(
+                pl.col(name="stored") & pl.col(name="metadata_changed"),
+            ).select("permalink"),
+        ]
+
+        if self.rotation_days:
+            checks.append(
+                rotation(regulation_old=regulation_old, days=self.rotation_days),
+            )
+
+        rows: pl.DataFrame = (
+            rows.join(
+                other=pl.DataFrame(
+                    schema={"permalink": pl.Utf8, "fingerprint_fresh": pl.Utf8},
+                )
+                if dry_run
+                else fetch_fingerprints(
+                    permalinks=pl.concat(items=checks)
+                    .unique()
+                    .get_column(name="permalink"),
+                ),
+                on="permalink",
+                how="left",
+            )
+            .with_columns(
+                pl.when(~pl.col(name="stored"))
+                .then(statement=pl.lit(value="new"))
+                .when(~pl.col(name="listed") & pl.lit(value=full))
+                .then(statement=pl.lit(value="delete"))
+                .when(pl.col(name="fingerprint_fresh") != pl.col(name="fingerprint"))
+                .then(statement=pl.lit(value="changed"))
+                .when(pl.col(name="metadata_changed"))
+                .then(statement=pl.lit(value="update"))
+                .otherwise(statement=pl.lit(value="keep"))
+                .alias(name="action"),
+            )
+            .drop("listed", "stored", "fingerprint_fresh")
+        )
+
+        return SyncPlan(
+            full=full,
+            dry_run=dry_run,
+            stored=regulation_old.height,
+            listed=regulation_new.height,
+            rows=rows,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def add(self, fresh: pl.DataFrame, report: SyncReport) -> pl.DataFrame:
+        start: float = time.perf_counter()
+        self.progress(f"Mengambil detail {fresh.height} regulasi.")
+        detail, _ = crawler.get_detail_regs(permalinks=fresh["permalink"])
+        new: pl.DataFrame = (
+            fresh.select(LISTING_FIELDS)
+            .with_columns(detail)
+            .filter(pl.col(name="detail").is_not_null())
+            .lazy()
+            .pipe(function=processed)
+            .collect()
+        )
+        report.timings["detail"] = time.perf_counter() - start
+
+        start: float = time.perf_counter()
+        self.progress(f"Membuat pertanyaan-jawaban untuk {new.height} regulasi.")
+        embed: pl.DataFrame = (
+            new.pipe(function=clean.with_clean_text)
+            .pipe(function=qa.with_qa_lists)
+            .filter(pl.col(name="body_final").is_not_null())
+        )
+        new: pl.DataFrame = new.join(
+            other=embed.select("permalink"),
+            on="permalink",
+            how="semi",
+        )
+        report.failed = fresh.join(other=new, on="permalink", how="anti")[
+            "permalink"
+        ].to_list()
+        report.timings["qa"] = time.perf_counter() - start
+
+        start: float = time.perf_counter()
+        self.progress(f"Menulis {embed.height} regulasi ke Chroma.")
+
+        if (
+            refreshed := fresh.filter(pl.col(name="action") == "changed").join(
+                other=new,
+                on="permalink",
+                how="semi",
+            )
+        ).height:
+            self.collection.delete(
+                where={"permalink": {"$in": refreshed["permalink"].to_list()}},
+            )
+
+        embed: pl.DataFrame = embed_rows(embed=embed)
+        max_batch: int = self.chroma_client.get_max_batch_size()
+
+        for i in range(0, len(embed), max_batch):
+            batch: pl.DataFrame = embed[i : i + max_batch]
+            self.collection.upsert(
+                ids=batch["id"].to_list(),
+                metadatas=batch["metadata"].to_list(),
+                documents=(documents := batch["document"].to_list()),
+                embeddings=self.embedder(texts=documents),
+            )
+
+        report.timings["chroma_add"] = time.perf_counter() - start
+        report.embedded = self.embedder.stats.model_copy()
+        report.added = new.height
+        report.refreshed = refreshed.height
+
+        return new
+
+    def apply(self, plan: SyncPlan) -> SyncReport:
+        start: float = time.perf_counter()
+        report = SyncReport()
+
+        new: pl.DataFrame = pl.DataFrame(schema=store.REGULATION_SCHEMA)
+
+        if (fresh := plan.action("new", "changed")).height:
+            new: pl.DataFrame = self.add(fresh=fresh, report=report)
+            new.write_json(file=self.path / "_new.json")
+
+        if (
+            update := plan.action("update", "changed")
+            .filter(pl.col(name="metadata_changed"))
+            .join(other=new, on="permalink", how="anti")
+        ).height:
+            self.progress(f"Memperbarui metadata {update.height} regulasi.")
+            report.update = update_metadatas(
+                chroma_client=self.chroma_client,
+                collection=self.collection,
+                update=update,
+            )
+            report.timings["chroma_update"] = report.update.elapsed
+            update.write_json(file=self.path / "_update.json")
+
+        if (delete := plan.action("delete").select("permalink")).height:
+            self.progress(f"Menghapus {delete.height} regulasi.")
+            delete_start: float = time.perf_counter()
+            max_batch: int = self.chroma_client.get_max_batch_size()
+
+            for i in range(0, delete.height, max_batch):
+                self.collection.delete(
+                    where={
+                        "permalink": {
+                            "$in": delete["permalink"][i : i + max_batch].to_list(),
+                        },
+                    },
+                )
+
+            report.deleted = delete.height
+            report.timings["chroma_delete"] = time.perf_counter() - delete_start
+            delete.write_json(file=self.path / "_delete.json")
+
+        write_start: float = time.perf_counter()
+        self.progress("Menyimpan regulasi dan watermark.")
+        regulation: pl.DataFrame = pl.concat(
+            items=[
+                plan.action("keep", "update", "changed").select(
+                    store.REGULATION_SCHEMA.names(),
+                ),
+                new.select(store.REGULATION_SCHEMA.names()),
+            ],
+        ).unique(subset="permalink", keep="last")
+        store.write(df=regulation, path=self.path_regulation)
+        facet.write(frame=regulation.lazy(), path=self.path_facet)
+
+        crawler.Watermark.load(path=self.path_watermark).advance(
+            permalinks=regulation["permalink"],
+            tanggal_efektif=regulation["tanggal_efektif"].max(),
+            full=plan.full,
+        ).save(path=self.path_watermark)
+        report.timings["write"] = time.perf_counter() - write_start
+
+        lexical_start: float = time.perf_counter()
+        self.progress("Membangun indeks leksikal.")
+        lexical.write(
+            collection=self.collection,
+            regulation=regulation,
+            path=self.path,
+        )
+        report.timings["lexical"] = time.perf_counter() - lexical_start
+        store.bump_generation(path=self.path)
+
+        report.elapsed = time.perf_counter() - start
+
+        return report
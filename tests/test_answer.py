@@ -0,0 +1,100 @@
+import datetime
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(object=Path(__file__).parents[1] / "src" / "scrape"))
+
+import answer
+
+KEY = {
+    "model": "gemini",
+    "include": ["Berlaku"],
+    "doc_ids": ["pp-55-2022"],
+    "history": "",
+}
+
+
+class AnswerCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path: Path = Path(self.tmp.name) / "answer.sqlite3"
+
+    def cache(self, **kwargs: object) -> answer.AnswerCache:
+        cache = answer.AnswerCache(path=self.path, **kwargs)
+        self.addCleanup(cache.close)
+
+        return cache
+
+    def test_similar_question_hits(self) -> None:
+        cache: answer.AnswerCache = self.cache()
+        cache.put(
+            embedding=np.array([1.0, 0.0]),
+            **KEY,
+            question="Tarif PPh?",
+            answer="5%",
+        )
+
+        hit: answer.CachedAnswer = cache.get(
+            embedding=np.array([0.99, 0.01]),
+            **KEY,
+            question="Berapa tarif PPh?",
+        )
+
+        self.assertEqual(hit.answer, "5%")
+        self.assertIsNone(
+            cache.get(embedding=np.array([0.0, 1.0]), **KEY, question="Lain?"),
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_exact_match_without_embedding(self) -> None:
+        cache: answer.AnswerCache = self.cache()
+        cache.put(embedding=None, **KEY, question="Tarif  PPh?", answer="5%")
+
+        self.assertEqual(
+            cache.get(embedding=None, **KEY, question="tarif pph?").answer,
+            "5%",
+        )
+        self.assertIsNone(cache.get(embedding=None, **KEY, question="Tarif PPN?"))
+
+    def test_expired(self) -> None:
+        cache: answer.AnswerCache = self.cache(ttl=datetime.timedelta())
+        cache.put(embedding=None, **KEY, question="Tarif PPh?", answer="5%")
+
+        self.assertIsNone(cache.get(embedding=None, **KEY, question="Tarif PPh?"))
+
+    def test_generation(self) -> None:
+        self.cache(generation=1).put(
+            embedding=None,
+            **KEY,
+            question="Tarif PPh?",
+            answer="5%",
+        )
+
+        self.assertIsNone(
+            self.cache(generation=2).get(
+                embedding=None,
+                **KEY,
+                question="Tarif PPh?",
+            ),
+        )
+
+    def test_put_upserts(self) -> None:
+        cache: answer.AnswerCache = self.cache()
+
+        for text in ["5%", "10%"]:
+            cache.put(embedding=None, **KEY, question="Tarif PPh?", answer=text)
+
+        self.assertEqual(cache.summary(), (1, 0))
+        self.assertEqual(
+            cache.get(embedding=None, **KEY, question="Tarif PPh?").answer,
+            "10%",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
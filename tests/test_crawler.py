@@ -0,0 +1,214 @@
+import datetime
+import json
+import sys
+import tempfile
+import unittest
+from collections.abc import Callable
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(object=Path(__file__).parents[1] / "src" / "scrape"))
+
+import crawler
+from cache import ResponseCache
+
+CONFIG = {"url": {"base": "http://test", "index": "/index", "detail": "/detail"}}
+
+
+async def mocked(
+    client: crawler.ReqBeClient,
+    handler: Callable[[httpx.Request], httpx.Response],
+) -> crawler.ReqBeClient:
+    await client.client.aclose()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler=handler))
+
+    return client
+
+
+class AdaptiveLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_additive_increase(self) -> None:
+        limiter = crawler.AdaptiveLimiter(
+            initial=4,
+            minimum=1,
+            maximum=5,
+            target_latency=1.0,
+        )
+
+        for _ in range(20):
+            await limiter.acquire()
+            await limiter.release(latency=0.1, ok=True)
+
+        self.assertEqual(limiter.limit, 5)
+
+    async def test_decrease_once_per_window(self) -> None:
+        limiter = crawler.AdaptiveLimiter(
+            initial=16,
+            minimum=1,
+            maximum=32,
+            target_latency=1.0,
+        )
+
+        for _ in range(4):
+            await limiter.acquire()
+
+        for _ in range(4):
+            await limiter.release(latency=0.5, ok=False)
+
+        self.assertEqual(limiter.limit, 8)
+
+        await limiter.acquire()
+        await limiter.release(latency=0.0, ok=False)
+
+        self.assertEqual(limiter.limit, 4)
+
+
+class RetryTest(unittest.IsolatedAsyncioTestCase):
+    def test_is_retryable(self) -> None:
+        request = httpx.Request(method="POST", url="http://test")
+
+        for status, retryable in [(404, False), (408, True), (429, True), (503, True)]:
+            with self.subTest(status=status):
+                self.assertEqual(
+                    crawler.is_retryable(
+                        error=httpx.HTTPStatusError(
+                            message="",
+                            request=request,
+                            response=httpx.Response(
+                                status_code=status,
+                                request=request,
+                            ),
+                        ),
+                    ),
+                    retryable,
+                )
+
+        self.assertTrue(crawler.is_retryable(error=httpx.ConnectError(message="")))
+
+    async def test_client_error_fails_fast(self) -> None:
+        calls: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+
+            return httpx.Response(status_code=404)
+
+        async with await mocked(
+            client=crawler.ReqBeClient(
+                limiter=crawler.BoundedLimiter(concurrency=1),
+                max_connections=1,
+                backoff_base=0,
+                config=CONFIG,
+            ),
+            handler=handler,
+        ) as client:
+            with self.assertRaises(httpx.HTTPStatusError):
+                await client.post(url="/detail", data={})
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(client.stats.retries, 0)
+
+    async def test_rate_limit_is_retried(self) -> None:
+        statuses: list[int] = [429, 503, 200]
+
+        async with await mocked(
+            client=crawler.ReqBeClient(
+                limiter=crawler.BoundedLimiter(concurrency=1),
+                max_connections=1,
+                backoff_base=0,
+                config=CONFIG,
+            ),
+            handler=lambda _: httpx.Response(
+                status_code=statuses.pop(0),
+                json={"ok": True},
+            ),
+        ) as client:
+            self.assertEqual(await client.post(url="/detail", data={}), {"ok": True})
+
+        self.assertEqual(client.stats.retries, 2)
+
+
+class ListingCrawlerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_incremental_stops_at_known_page(self) -> None:
+        pages: list[int] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            page: int = json.loads(s=request.content)["data"]["pagination"]["page"]
+            pages.append(page)
+
+            return httpx.Response(
+                status_code=200,
+                json={
+                    "data": {
+                        "search_data": [
+                            {
+                                "permalink": f"p{page}-{i}",
+                                "tanggal_efektif": "01-01-2024",
+                            }
+                            for i in range(2)
+                        ],
+                    },
+                    "pagination": {"total_page": 5},
+                },
+            )
+
+        async with await mocked(
+            client=crawler.ListingCrawler(limit=2, config=CONFIG),
+            handler=handler,
+        ) as client:
+            data: list[dict] = await client.crawl_incremental(
+                watermark=crawler.Watermark(
+                    tanggal_efektif=datetime.date(year=2024, month=1, day=1),
+                    permalinks={"p2-0", "p2-1", "p3-0", "p3-1"},
+                ),
+            )
+
+        self.assertEqual(pages, [1, 2])
+        self.assertEqual(len(data), 4)
+
+
+class ConditionalCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_not_modified_uses_cache(self) -> None:
+        headers: list[httpx.Headers] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            headers.append(request.headers)
+
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(status_code=304)
+
+            return httpx.Response(
+                status_code=200,
+                json={"data": [{"body_final": "isi"}]},
+                headers={"etag": '"v1"'},
+            )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(2):
+                async with await mocked(
+                    client=crawler.ReqBeClient(
+                        limiter=crawler.BoundedLimiter(concurrency=1),
+                        max_connections=1,
+                        config=CONFIG,
+                        cache=ResponseCache(
+                            path=Path(tmp),
+                            ttl=datetime.timedelta(),
+                        ),
+                    ),
+                    handler=handler,
+                ) as client:
+                    body: dict = await client.post(
+                        url="/detail",
+                        data={"permalink": "pp-55-2022"},
+                        extract=lambda body: body["data"][0],
+                    )
+
+                self.assertEqual(body, {"body_final": "isi"})
+
+        self.assertNotIn("if-none-match", headers[0])
+        self.assertEqual(headers[1]["if-none-match"], '"v1"')
+        self.assertEqual(client.stats.cache_hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
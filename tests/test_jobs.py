@@ -0,0 +1,58 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(object=Path(__file__).parents[1] / "src" / "scrape"))
+
+import jobs
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.queue = jobs.JobQueue(path=Path(self.tmp.name) / "jobs.sqlite3")
+        self.addCleanup(self.queue.close)
+
+    def test_enqueue_dedupes_on_params(self) -> None:
+        dry_run: jobs.Job = self.queue.enqueue(kind="sync", params={"dry_run": True})
+        real: jobs.Job = self.queue.enqueue(kind="sync", params={"dry_run": False})
+
+        self.assertNotEqual(dry_run.id, real.id)
+        self.assertEqual(
+            self.queue.enqueue(kind="sync", params={"dry_run": True}).id,
+            dry_run.id,
+        )
+        self.assertEqual(real.params, {"dry_run": False})
+
+    def test_enqueue_after_finish(self) -> None:
+        first: jobs.Job = self.queue.enqueue(kind="sync")
+        self.queue.finish(job_id=first.id, result="", timings={})
+
+        self.assertNotEqual(self.queue.enqueue(kind="sync").id, first.id)
+
+    def test_claim_in_order(self) -> None:
+        first: jobs.Job = self.queue.enqueue(kind="sync", params={"full": True})
+        second: jobs.Job = self.queue.enqueue(kind="sync")
+
+        claimed: jobs.Job = self.queue.claim()
+
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, "running")
+        self.assertIsNotNone(claimed.started_at)
+        self.assertTrue(self.queue.pending())
+        self.assertEqual(self.queue.claim().id, second.id)
+        self.assertIsNone(self.queue.claim())
+        self.assertFalse(self.queue.pending())
+
+    def test_requeue_stale(self) -> None:
+        job: jobs.Job = self.queue.enqueue(kind="sync")
+        self.queue.claim()
+
+        self.assertEqual(self.queue.requeue_stale(), 1)
+        self.assertEqual(self.queue.get(job_id=job.id).status, "queued")
+
+
+if __name__ == "__main__":
+    unittest.main()
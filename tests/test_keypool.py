@@ -0,0 +1,59 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(object=Path(__file__).parents[1] / "src" / "scrape"))
+
+import keypool
+
+
+class TryAcquireTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.pool = keypool.KeyPool(
+            api_keys=["test-key-0001"],
+            path=Path(self.tmp.name) / "keypool.sqlite3",
+            rpm=0.001,
+            burst=2,
+            reserve=1,
+        )
+        self.addCleanup(self.pool.close)
+
+    def test_reserve_kept_for_chat(self) -> None:
+        key_id, _ = self.pool.try_acquire(priority=keypool.LANES["qa"])
+        self.assertIsNotNone(key_id)
+
+        key_id, delay = self.pool.try_acquire(priority=keypool.LANES["qa"])
+        self.assertIsNone(key_id)
+        self.assertGreater(delay, 0)
+
+        key_id, _ = self.pool.try_acquire(priority=keypool.LANES["chat"])
+        self.assertIsNotNone(key_id)
+
+    def test_chat_waiter_preempts_qa(self) -> None:
+        waiter_id: int = self.pool.wait(priority=keypool.LANES["chat"])
+
+        self.assertEqual(
+            self.pool.try_acquire(priority=keypool.LANES["qa"]),
+            (None, self.pool.poll),
+        )
+
+        self.pool.done_waiting(waiter_id=waiter_id)
+
+        self.assertIsNotNone(self.pool.try_acquire(priority=keypool.LANES["qa"])[0])
+
+    def test_rate_limited_key_cools_down(self) -> None:
+        key_id, _ = self.pool.try_acquire(priority=keypool.LANES["chat"])
+        self.pool.release(key_id=key_id, latency=0.1, ok=False, rate_limited=True)
+
+        key_id, delay = self.pool.try_acquire(priority=keypool.LANES["chat"])
+
+        self.assertIsNone(key_id)
+        self.assertGreater(delay, self.pool.cooldown - 1)
+        self.assertEqual(self.pool.usage()[0].rate_limited, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
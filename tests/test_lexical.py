@@ -0,0 +1,73 @@
+import sys
+import unittest
+from pathlib import Path
+
+import polars as pl
+
+sys.path.append(str(object=Path(__file__).parents[1] / "src" / "scrape"))
+
+import lexical
+
+
+class CiteTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.index = lexical.LexicalIndex(
+            docs=pl.DataFrame(
+                schema={
+                    "doc": pl.UInt32,
+                    "id": pl.Utf8,
+                    "permalink": pl.Utf8,
+                    "status_dokumen": pl.Utf8,
+                    "length": pl.UInt32,
+                },
+            ),
+            postings=pl.DataFrame(
+                schema={"term": pl.Utf8, "doc": pl.UInt32, "tf": pl.UInt32},
+            ),
+            citation=lexical.citations(
+                regulation=pl.LazyFrame(
+                    data={
+                        "permalink": ["per-1-pj-2024", "se-2-pj-2024", "pp-55-2022"],
+                        "jenis_peraturan": [
+                            "Peraturan Direktur Jenderal Pajak",
+                            "Surat Edaran Direktur Jenderal Pajak",
+                            "Peraturan Pemerintah",
+                        ],
+                        "nomor_peraturan": [
+                            "PER-1/PJ/2024",
+                            "SE-2/PJ/2024",
+                            "55 TAHUN 2022",
+                        ],
+                        "status_dokumen": ["Berlaku", "Berlaku", "Berlaku"],
+                    },
+                ),
+            ).collect(),
+        )
+
+    def test_per_date_is_not_a_citation(self) -> None:
+        self.assertIsNone(
+            self.index.cite(query="tarif PPh berlaku per 1 Januari 2024"),
+        )
+        self.assertIsNone(self.index.cite(query="se 2 februari 2024 sudah lapor?"))
+
+    def test_code_citation(self) -> None:
+        self.assertEqual(
+            self.index.cite(query="Apa isi PER-1/PJ/2024?"),
+            "per-1-pj-2024",
+        )
+        self.assertEqual(
+            self.index.cite(query="penjelasan se - 2 / pj / 2024"),
+            "se-2-pj-2024",
+        )
+
+    def test_numbered_citation(self) -> None:
+        self.assertEqual(
+            self.index.cite(query="Ketentuan PP Nomor 55 Tahun 2022 tentang PPh"),
+            "pp-55-2022",
+        )
+        self.assertIsNone(self.index.cite(query="PP 55 Tahun 2022", include=[]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import datetime
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import polars as pl
+
+sys.path.append(str(object=Path(__file__).parents[1] / "src" / "scrape"))
+
+import sync
+
+DATE = datetime.date(year=2024, month=1, day=1)
+
+
+def listing(statuses: dict[str, str]) -> pl.DataFrame:
+    return pl.DataFrame(
+        data={
+            "permalink": list(statuses),
+            "perihal": [f"Perihal {permalink}" for permalink in statuses],
+            "tanggal_efektif": [DATE] * len(statuses),
+            "status_dokumen": list(statuses.values()),
+            "topik": ["2"] * len(statuses),
+        },
+    )
+
+
+def fingerprints(values: dict[str, str]) -> pl.DataFrame:
+    return pl.DataFrame(
+        data={
+            "permalink": list(values),
+            "fingerprint_fresh": list(values.values()),
+        },
+        schema={"permalink": pl.Utf8, "fingerprint_fresh": pl.Utf8},
+    )
+
+
+class PlanTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        path: Path = Path(self.tmp.name)
+        listing(
+            statuses={"a": "Berlaku", "b": "Berlaku", "c": "Berlaku"},
+        ).with_columns(
+            pl.format("fp-{}", pl.col(name="permalink")).alias(name="fingerprint"),
+        ).write_parquet(file=path / "regulation.parquet")
+
+        self.engine = sync.SyncEngine(
+            chroma_client=None,
+            collection=None,
+            path=path,
+            embedder=mock.Mock(),
+        )
+
+    def plan(
+        self,
+        fresh: dict[str, str] | None = None,
+        **kwargs: bool,
+    ) -> tuple[dict[str, str], mock.Mock]:
+        with (
+            mock.patch.object(
+                target=sync.SyncEngine,
+                attribute="listing",
+                return_value=listing(
+                    statuses={"a": "Berlaku", "b": "Dicabut", "d": "Berlaku"},
+                ),
+            ),
+            mock.patch.object(
+                target=sync,
+                attribute="fetch_fingerprints",
+                return_value=fingerprints(values=fresh or {}),
+            ) as fetch,
+        ):
+            plan: sync.SyncPlan = self.engine.plan(**kwargs)
+
+        return dict(plan.rows.select("permalink", "action").iter_rows()), fetch
+
+    def test_full_plan(self) -> None:
+        actions, fetch = self.plan(fresh={"b": "fp-b2"}, full=True)
+
+        self.assertEqual(
+            actions,
+            {"a": "keep", "b": "changed", "c": "delete", "d": "new"},
+        )
+        self.assertEqual(fetch.call_args.kwargs["permalinks"].to_list(), ["b"])
+
+    def test_incremental_plan_keeps_unlisted(self) -> None:
+        actions, _ = self.plan(fresh={"b": "fp-b"}, full=False)
+
+        self.assertEqual(
+            actions,
+            {"a": "keep", "b": "update", "c": "keep", "d": "new"},
+        )
+
+    def test_dry_run_skips_detail(self) -> None:
+        actions, fetch = self.plan(full=True, dry_run=True)
+
+        fetch.assert_not_called()
+        self.assertEqual(actions["b"], "update")
+
+    def test_rotation_is_opt_in(self) -> None:
+        self.engine.rotation_days = 1
+        _, fetch = self.plan(full=False)
+
+        self.assertEqual(
+            sorted(fetch.call_args.kwargs["permalinks"].to_list()),
+            ["a", "b", "c"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()